@@ -0,0 +1,261 @@
+"""Ragged batch alignment.
+
+(c) Daniel Vogler
+
+Batch alignment:
+- ragged sequences packed into one buffer without padding
+- accumulated cost matrices of all pairs in one flat buffer
+- recurrence evaluated anti-diagonal by anti-diagonal across all pairs
+"""
+import logging
+from typing import List, Tuple
+
+import numpy as np
+
+from dtwmetrics.dtwmetrics import DTWMetrics
+
+
+class DTWBatch:
+    """Align many ragged pairs of sequences in one vectorized kernel."""
+
+    def __init__(self):
+        """Init."""
+        self.dtwm = DTWMetrics()
+
+    def pack(
+        self, sequences: List[np.ndarray]
+    ) -> Tuple[np.ndarray, np.ndarray]:
+        """Pack ragged sequences into one contiguous buffer.
+
+        Args:
+            sequences (List[np.ndarray]): sequences of equal number of
+                features
+
+        Raises:
+            ValueError: If sequences differ in number of features
+
+        Returns:
+            Tuple[np.ndarray, np.ndarray]: buffer (total length x
+                features) and offsets, sequence k is
+                buffer[offsets[k] : offsets[k + 1]]
+        """
+        sequences = [self.dtwm.dim_check(x) for x in sequences]
+
+        if len({x.shape[1] for x in sequences}) > 1:
+            raise ValueError("Sequences differ in number of features")
+
+        offsets = np.zeros(len(sequences) + 1, dtype=np.int64)
+        np.cumsum([len(x) for x in sequences], out=offsets[1:])
+
+        return np.concatenate(sequences).astype(np.double), offsets
+
+    def batch(
+        self,
+        references: List[np.ndarray],
+        queries: List[np.ndarray],
+        distance_metric: str = "euclidean",
+        step_pattern: str = "symmetric_p0",
+        sequence: str = "whole",
+        paths: bool = False,
+        max_cells: int = 2**20,
+    ):
+        """Compute DTW of many ragged pairs in one kernel.
+
+        References and queries are packed without padding. The cost and
+        accumulated cost matrices of all pairs are laid out in one flat
+        buffer and evaluated anti-diagonal by anti-diagonal across all
+        pairs at once, so there is no per-pair Python overhead unless
+        paths are requested. Results equal DTWMetrics.step_symmetric_p0
+        and step_symmetric_p1.
+
+        Args:
+            references (List[np.ndarray]): sequences 1
+            queries (List[np.ndarray]): sequences 2
+            distance_metric (str, optional): distance metric, vectorized
+                for "euclidean", "sqeuclidean" and "cityblock".
+                Defaults to "euclidean".
+            step_pattern (str, optional): "symmetric_p0" or
+                "symmetric_p1". Defaults to "symmetric_p0".
+            sequence (str, optional): whole or part of sequence
+                (symmetric_p0 only). Defaults to "whole".
+            paths (bool, optional): also return optimal warping paths.
+                Defaults to False.
+            max_cells (int, optional): matrix cells per kernel call, pairs
+                are split into chunks above. Defaults to 2**20.
+
+        Raises:
+            ValueError: If inputs or options are undefined
+
+        Returns:
+            np.ndarray: distances, plus concatenated paths and path
+                offsets if requested
+        """
+        logging.info("Compute batch of %d pairs", len(references))
+
+        if len(references) != len(queries):
+            raise ValueError("Number of references and queries differ")
+
+        if step_pattern not in ("symmetric_p0", "symmetric_p1"):
+            raise ValueError("Undefined step pattern")
+
+        if sequence not in ("whole", "sub"):
+            raise ValueError("Undefined sequence type")
+
+        X, x_offsets = self.pack(references)
+        Y, y_offsets = self.pack(queries)
+        N = np.diff(x_offsets)
+        M = np.diff(y_offsets)
+
+        if step_pattern == "symmetric_p1" and (
+            np.any(N > 2 * M) or np.any(M > 2 * N)
+        ):
+            raise ValueError("Sequence length ratio > 2")
+
+        # chunks of pairs with about max_cells cells
+        cells_before = np.cumsum(N * M) - N * M
+        chunk = cells_before // max_cells
+        bounds = np.concatenate(
+            [[0], np.flatnonzero(np.diff(chunk)) + 1, [len(N)]]
+        )
+
+        distances = np.empty(len(N))
+        owps = []
+        for first, last in zip(bounds[:-1], bounds[1:]):
+            pairs = np.arange(first, last)
+            D, padded = self.batch_kernel(
+                X,
+                x_offsets,
+                Y,
+                y_offsets,
+                pairs,
+                distance_metric,
+                step_pattern,
+                sequence,
+            )
+            distances[pairs] = D[padded[1:] - 1]
+
+            if paths:
+                # paths are traced per pair on the padded matrices
+                for j, k in enumerate(pairs):
+                    acm = D[padded[j] : padded[j + 1]]
+                    acm = acm.reshape(N[k] + 1, M[k] + 1)[1:, 1:]
+                    owps.append(self.dtwm.optimal_warping_path(acm))
+
+        if not paths:
+            return distances
+
+        path_offsets = np.zeros(len(owps) + 1, dtype=np.int64)
+        np.cumsum([len(owp) for owp in owps], out=path_offsets[1:])
+
+        return distances, np.concatenate(owps), path_offsets
+
+    def batch_kernel(
+        self,
+        X: np.ndarray,
+        x_offsets: np.ndarray,
+        Y: np.ndarray,
+        y_offsets: np.ndarray,
+        pairs: np.ndarray,
+        distance_metric: str,
+        step_pattern: str,
+        sequence: str,
+    ) -> Tuple[np.ndarray, np.ndarray]:
+        """Evaluate accumulated cost matrices of packed pairs.
+
+        Each matrix is stored with one padding row and column, D(−1, −1)
+        := 0 and ∞ elsewhere (row −1 := 0 for sub-sequences), so that the
+        boundary conditions of DTWMetrics.step_symmetric_p0 follow from
+        the recurrence. symmetric_p1 keeps its own boundary values.
+
+        Args:
+            X (np.ndarray): packed references
+            x_offsets (np.ndarray): reference offsets
+            Y (np.ndarray): packed queries
+            y_offsets (np.ndarray): query offsets
+            pairs (np.ndarray): pair indices of this chunk
+            distance_metric (str): distance metric
+            step_pattern (str): step pattern
+            sequence (str): whole or part of sequence
+
+        Returns:
+            Tuple[np.ndarray, np.ndarray]: padded matrices (flat) and
+                their offsets
+        """
+        N = np.diff(x_offsets)[pairs]
+        M = np.diff(y_offsets)[pairs]
+        sizes = N * M
+
+        # cell coordinates of all pairs
+        cell_offsets = np.append(0, np.cumsum(sizes))
+        pair = np.repeat(np.arange(len(pairs)), sizes)
+        local = np.arange(cell_offsets[-1]) - cell_offsets[pair]
+        n = local // M[pair]
+        m = local % M[pair]
+
+        # cost of all cells at once
+        a = X[x_offsets[pairs][pair] + n]
+        b = Y[y_offsets[pairs][pair] + m]
+        if distance_metric in ("euclidean", "sqeuclidean", "cityblock"):
+            gaps = np.abs(a - b)
+            if distance_metric == "cityblock":
+                cost = gaps.sum(axis=1)
+            else:
+                cost = np.sum(gaps**2, axis=1)
+                if distance_metric == "euclidean":
+                    np.sqrt(cost, out=cost)
+        else:
+            cost = np.concatenate(
+                [
+                    self.dtwm.cm(
+                        X[x_offsets[k] : x_offsets[k + 1]],
+                        Y[y_offsets[k] : y_offsets[k + 1]],
+                        distance_metric,
+                    ).ravel()
+                    for k in pairs
+                ]
+            )
+
+        # padded layout
+        stride = M + 1
+        padded = np.append(0, np.cumsum((N + 1) * stride))
+        position = padded[pair] + (n + 1) * stride[pair] + m + 1
+        D = np.full(padded[-1], np.inf)
+
+        if step_pattern == "symmetric_p0":
+            D[padded[:-1]] = 0.0
+            if sequence == "sub":
+                top = np.repeat(padded[:-1], M) + (
+                    np.arange(M.sum()) - np.repeat(np.cumsum(M) - M, M) + 1
+                )
+                D[top] = 0.0
+            steps = (stride[pair] + 1, stride[pair], 1)
+            active = np.ones(len(cost), dtype=bool)
+        else:
+            # D(0, 0) := 0, D(1, 1) := c(x_1, y_1), ∞ on rows/columns 0, 1
+            D[position[(n == 0) & (m == 0)]] = 0.0
+            corner = (n == 1) & (m == 1)
+            D[position[corner]] = cost[corner]
+            steps = (stride[pair] + 1, 2 * stride[pair] + 1, stride[pair] + 2)
+            active = (n >= 2) & (m >= 2)
+
+        # group active cells by anti-diagonal
+        diagonal = (n + m)[active]
+        by_diagonal = np.argsort(diagonal, kind="stable")
+        order = np.flatnonzero(active)[by_diagonal]
+        groups = np.searchsorted(
+            diagonal[by_diagonal], np.arange(diagonal.max(initial=-1) + 2)
+        )
+        steps = [np.broadcast_to(s, active.shape)[order] for s in steps]
+        position = position[order]
+        cost = cost[order]
+
+        for g0, g1 in zip(groups[:-1], groups[1:]):
+            if g0 == g1:
+                continue
+            p = position[g0:g1]
+            D[p] = cost[g0:g1] + np.minimum(
+                np.minimum(D[p - steps[0][g0:g1]], D[p - steps[1][g0:g1]]),
+                D[p - steps[2][g0:g1]],
+            )
+
+        return D, padded
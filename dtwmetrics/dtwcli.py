@@ -0,0 +1,422 @@
+"""Command line batch runner.
+
+(c) Daniel Vogler
+
+Batch alignment:
+- read sequences from npy/npz/csv/parquet files or directories
+- one-vs-many or pairwise alignments in parallel chunks
+- stream results to a JSON lines file, resumable after interruption
+
+Usage:
+    dtwmetrics data/ --reference ref.npy --output results.jsonl --jobs 4
+"""
+import argparse
+import json
+import logging
+import os
+from collections import OrderedDict
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from itertools import combinations, islice
+from typing import Iterator, List, Optional, Set, Tuple
+
+import numpy as np
+
+from dtwmetrics.dtwmetrics import DTWMetrics
+from dtwmetrics.dtwresult import DTWResult
+
+SUFFIXES = (".npy", ".npz", ".csv", ".parquet")
+
+# per process state of the alignment workers
+WORKER_STATE = {}
+
+
+def discover(paths: List[str]) -> List[Tuple[str, str, Optional[str]]]:
+    """Discover sequences in files and directories.
+
+    npy and csv files hold one sequence (rows are samples, columns are
+    features), npz files one sequence per array and parquet files one
+    sequence per column.
+
+    Args:
+        paths (List[str]): files or directories
+
+    Raises:
+        ValueError: If a file type is not supported
+
+    Returns:
+        List[Tuple[str, str, Optional[str]]]: name, path and key of
+            each sequence
+    """
+    files = []
+    for path in paths:
+        if os.path.isdir(path):
+            files.extend(
+                os.path.join(path, f)
+                for f in sorted(os.listdir(path))
+                if f.endswith(SUFFIXES)
+            )
+        else:
+            files.append(path)
+
+    sequences = []
+    for path in files:
+        name = os.path.basename(path)
+        suffix = os.path.splitext(path)[1]
+
+        if suffix in (".npy", ".csv"):
+            sequences.append((name, path, None))
+        elif suffix == ".npz":
+            with np.load(path) as data:
+                keys = data.files
+            sequences.extend((name + ":" + k, path, k) for k in keys)
+        elif suffix == ".parquet":
+            keys = parquet_module().read_schema(path).names
+            sequences.extend((name + ":" + k, path, k) for k in keys)
+        else:
+            raise ValueError("Unsupported file type " + suffix)
+
+    return sequences
+
+
+def parquet_module():
+    """Import pyarrow.parquet on demand.
+
+    Raises:
+        ImportError: If pyarrow is not installed
+
+    Returns:
+        module: pyarrow.parquet
+    """
+    try:
+        import pyarrow.parquet as pq  # pylint: disable=import-outside-toplevel
+    except ImportError as err:
+        raise ImportError("Reading parquet files requires pyarrow") from err
+
+    return pq
+
+
+def load_sequence(path: str, key: Optional[str] = None) -> np.ndarray:
+    """Load sequence, memory-mapped where the format allows it.
+
+    Args:
+        path (str): file path
+        key (str, optional): array (npz) or column (parquet) name.
+            Defaults to None.
+
+    Returns:
+        np.ndarray: sequence
+    """
+    suffix = os.path.splitext(path)[1]
+
+    if suffix == ".npy":
+        return np.load(path, mmap_mode="r")
+
+    if suffix == ".npz":
+        with np.load(path) as data:
+            return data[key]
+
+    if suffix == ".csv":
+        return np.loadtxt(path, delimiter=",", ndmin=1)
+
+    table = parquet_module().read_table(path, columns=[key])
+
+    return table.column(key).to_numpy()
+
+
+def init_worker(sequences: List[Tuple[str, str, Optional[str]]], options):
+    """Initialize alignment worker.
+
+    Args:
+        sequences (List[Tuple[str, str, Optional[str]]]): sequences
+        options (dict): alignment options
+    """
+    WORKER_STATE["dtwm"] = DTWMetrics()
+    WORKER_STATE["sequences"] = sequences
+    WORKER_STATE["options"] = options
+    # loaded sequences, least recently used first
+    WORKER_STATE["cache"] = OrderedDict()
+
+
+def worker_sequence(index: int) -> np.ndarray:
+    """Load sequence, cached for the most recently used sequences.
+
+    Args:
+        index (int): sequence index
+
+    Returns:
+        np.ndarray: sequence
+    """
+    cache = WORKER_STATE["cache"]
+
+    if index in cache:
+        cache.move_to_end(index)
+        return cache[index]
+
+    _, path, key = WORKER_STATE["sequences"][index]
+    cache[index] = load_sequence(path, key)
+
+    if len(cache) > WORKER_STATE["options"]["cache_size"]:
+        cache.popitem(last=False)
+
+    return cache[index]
+
+
+def align_chunk(chunk: List[Tuple[int, int, int]]) -> List[dict]:
+    """Align a chunk of pairs.
+
+    Args:
+        chunk (List[Tuple[int, int, int]]): pair index, reference index
+            and query index of each pair
+
+    Returns:
+        List[dict]: results of each pair
+    """
+    dtwm = WORKER_STATE["dtwm"]
+    names = WORKER_STATE["sequences"]
+    options = WORKER_STATE["options"]
+
+    results = []
+    for k, i, j in chunk:
+        result = {"index": k, "reference": names[i][0], "query": names[j][0]}
+
+        try:
+            acm = dtwm.acm(
+                worker_sequence(i),
+                worker_sequence(j),
+                distance_metric=options["distance_metric"],
+                step_pattern=options["step_pattern"],
+                preprocess=options["preprocess"],
+                max_cost=options["max_cost"],
+            )
+            distance = dtwm.acm_distance(acm, "whole", options["max_cost"])
+            if distance == np.inf:
+                result["distance"] = None
+                result["abandoned"] = True
+            else:
+                result["distance"] = distance
+            if options["paths"] and "abandoned" not in result:
+                # run-length encoded, see DTWResult.decode_path
+                start, moves, runs = DTWResult.encode_path(
+                    dtwm.optimal_warping_path(acm)
+                )
+                result["path"] = {
+                    "start": start.tolist(),
+                    "moves": moves.tolist(),
+                    "runs": runs.tolist(),
+                }
+        except ValueError as err:
+            result["distance"] = None
+            result["error"] = str(err)
+
+        results.append(result)
+
+    return results
+
+
+def completed_pairs(output: str) -> Set[Tuple[str, str]]:
+    """Read pairs already written to output file.
+
+    Pairs are identified by their sequence names, so that resuming with
+    added or removed input files skips the right pairs. A partially
+    written last line (e.g. after a crash) is truncated.
+
+    Args:
+        output (str): output file
+
+    Returns:
+        Set[Tuple[str, str]]: reference and query name of each pair
+    """
+    done = set()
+
+    if not os.path.exists(output):
+        return done
+
+    valid = 0
+    with open(output, "rb") as f:
+        for line in f:
+            if not line.endswith(b"\n"):
+                break
+            try:
+                result = json.loads(line)
+                done.add((result["reference"], result["query"]))
+            except (ValueError, KeyError):
+                break
+            valid += len(line)
+
+    with open(output, "ab") as f:
+        f.truncate(valid)
+
+    logging.info("Resuming after %d completed pairs", len(done))
+
+    return done
+
+
+def pairs(
+    n_sequences: int, reference: Optional[int]
+) -> Iterator[Tuple[int, int, int]]:
+    """Generate pairs to align.
+
+    Args:
+        n_sequences (int): number of sequences
+        reference (int, optional): reference index for one-vs-many,
+            pairwise if None
+
+    Returns:
+        Iterator[Tuple[int, int, int]]: pair index, reference index and
+            query index
+    """
+    if reference is None:
+        index_pairs = combinations(range(n_sequences), 2)
+    else:
+        index_pairs = (
+            (reference, j) for j in range(n_sequences) if j != reference
+        )
+
+    for k, (i, j) in enumerate(index_pairs):
+        yield k, i, j
+
+
+def chunks(
+    iterator: Iterator[Tuple[int, int, int]], size: int
+) -> Iterator[List[Tuple[int, int, int]]]:
+    """Split iterator into chunks.
+
+    Args:
+        iterator (Iterator[Tuple[int, int, int]]): pairs
+        size (int): chunk size
+
+    Returns:
+        Iterator[List[Tuple[int, int, int]]]: chunks of pairs
+    """
+    while True:
+        chunk = list(islice(iterator, size))
+        if not chunk:
+            return
+        yield chunk
+
+
+def parse_args(argv: Optional[List[str]] = None) -> argparse.Namespace:
+    """Parse command line arguments.
+
+    Args:
+        argv (List[str], optional): arguments. Defaults to sys.argv.
+
+    Returns:
+        argparse.Namespace: arguments
+    """
+    parser = argparse.ArgumentParser(
+        prog="dtwmetrics",
+        description="Batch dynamic time warping of sequence files.",
+    )
+    parser.add_argument(
+        "inputs", nargs="+", help="sequence files or directories"
+    )
+    parser.add_argument(
+        "--reference",
+        help="reference sequence file (one-vs-many), pairwise otherwise",
+    )
+    parser.add_argument(
+        "--output", required=True, help="JSON lines result file"
+    )
+    parser.add_argument("--distance-metric", default="euclidean")
+    parser.add_argument("--step-pattern", default="symmetric_p0")
+    parser.add_argument(
+        "--preprocess", choices=["znorm", "derivative"], default=None
+    )
+    parser.add_argument(
+        "--max-cost",
+        type=float,
+        default=None,
+        help="abandon alignments exceeding this distance (written as null)",
+    )
+    parser.add_argument(
+        "--paths", action="store_true", help="write optimal warping paths"
+    )
+    parser.add_argument("--jobs", type=int, default=1)
+    parser.add_argument("--chunk-size", type=int, default=64)
+    parser.add_argument(
+        "--cache-size",
+        type=int,
+        default=32,
+        help="sequences kept in memory per worker",
+    )
+    parser.add_argument(
+        "--restart",
+        action="store_true",
+        help="discard existing results instead of resuming",
+    )
+
+    return parser.parse_args(argv)
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    """Run batch alignment.
+
+    Args:
+        argv (List[str], optional): arguments. Defaults to sys.argv.
+    """
+    args = parse_args(argv)
+
+    sequences = discover(args.inputs)
+    reference = None
+    if args.reference:
+        # the reference is not aligned with itself
+        real = os.path.realpath(args.reference)
+        sequences = [s for s in sequences if os.path.realpath(s[1]) != real]
+        reference = len(sequences)
+        sequences.extend(discover([args.reference]))
+
+    options = {
+        "distance_metric": args.distance_metric,
+        "step_pattern": args.step_pattern,
+        "preprocess": args.preprocess,
+        "max_cost": args.max_cost,
+        "paths": args.paths,
+        "cache_size": args.cache_size,
+    }
+
+    if args.restart and os.path.exists(args.output):
+        os.remove(args.output)
+
+    done = completed_pairs(args.output)
+    todo = (
+        (k, i, j)
+        for k, i, j in pairs(len(sequences), reference)
+        if (sequences[i][0], sequences[j][0]) not in done
+    )
+
+    logging.info("Aligning %d sequences", len(sequences))
+
+    with open(args.output, "a", encoding="utf-8") as out:
+
+        def write(results):
+            for result in results:
+                out.write(json.dumps(result) + "\n")
+            out.flush()
+
+        if args.jobs == 1:
+            init_worker(sequences, options)
+            for chunk in chunks(todo, args.chunk_size):
+                write(align_chunk(chunk))
+            return
+
+        with ProcessPoolExecutor(
+            args.jobs, initializer=init_worker, initargs=(sequences, options)
+        ) as executor:
+            pending = set()
+            for chunk in chunks(todo, args.chunk_size):
+                # bound the number of chunks in flight
+                if len(pending) >= 2 * args.jobs:
+                    finished, pending = wait(
+                        pending, return_when=FIRST_COMPLETED
+                    )
+                    for future in finished:
+                        write(future.result())
+                pending.add(executor.submit(align_chunk, chunk))
+
+            for future in wait(pending).done:
+                write(future.result())
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,161 @@
+"""DTW barycenter averaging.
+
+(c) Daniel Vogler
+
+Barycenter averaging:
+- align all members to the current template
+- replace each template sample by the mean of its aligned samples
+- members aligned in parallel worker processes on request
+
+References:
+(1) Petitjean, François, Alain Ketterlin, and Pierre Gançarski. A global
+    averaging method for dynamic time warping, with applications to
+    clustering. Pattern Recognition 44.3, 2011.
+    https://doi.org/10.1016/j.patcog.2010.09.013
+"""
+import logging
+from concurrent.futures import ProcessPoolExecutor
+from itertools import repeat
+from typing import List, Optional, Tuple
+
+import numpy as np
+
+from dtwmetrics.dtwmetrics import DTWMetrics
+
+
+class DTWBarycenter:
+    """Average sequences under dynamic time warping."""
+
+    def __init__(self):
+        """Init."""
+        self.dtwm = DTWMetrics()
+
+    def dba_alignment(
+        self,
+        template: np.ndarray,
+        sequence: np.ndarray,
+        distance_metric: str = "euclidean",
+        step_pattern: str = "symmetric_p0",
+    ) -> Tuple[np.ndarray, np.ndarray]:
+        """Align one sequence to the template and collect its samples.
+
+        Args:
+            template (np.ndarray): current average sequence (2D)
+            sequence (np.ndarray): member sequence
+            distance_metric (str, optional): distance metric.
+                Defaults to "euclidean".
+            step_pattern (str, optional): step pattern.
+                Defaults to "symmetric_p0".
+
+        Returns:
+            Tuple[np.ndarray, np.ndarray]: per template index sum of the
+                aligned samples and number of aligned samples
+        """
+        sequence = self.dtwm.dim_check(sequence)
+
+        acm = self.dtwm.acm(
+            template,
+            sequence,
+            distance_metric=distance_metric,
+            step_pattern=step_pattern,
+        )
+        # owp holds (query, reference) index pairs, last row is [M, N]
+        owp = self.dtwm.optimal_warping_path(acm)
+
+        # boundary condition aligns the end samples, the traceback
+        # starts next to them
+        owp[-1] -= 1
+
+        sums = np.zeros(template.shape)
+        counts = np.zeros(template.shape[0])
+        np.add.at(sums, owp[:, 1], sequence[owp[:, 0]])
+        np.add.at(counts, owp[:, 1], 1)
+
+        return sums, counts
+
+    def dba(
+        self,
+        sequences: List[np.ndarray],
+        init: Optional[np.ndarray] = None,
+        n_iterations: int = 10,
+        tol: float = 1e-5,
+        distance_metric: str = "euclidean",
+        step_pattern: str = "symmetric_p0",
+        n_jobs: Optional[int] = None,
+    ) -> np.ndarray:
+        """Compute DTW barycenter average of a set of sequences.
+
+        From (1): each iteration aligns all members to the current
+        template and replaces every template sample by the mean of the
+        member samples aligned to it.
+
+        Args:
+            sequences (List[np.ndarray]): sequences to average
+            init (np.ndarray, optional): initial template. Defaults to
+                the sequence of median length.
+            n_iterations (int, optional): maximum number of iterations.
+                Defaults to 10.
+            tol (float, optional): stop once no template sample moves
+                further than tol. Defaults to 1e-5.
+            distance_metric (str, optional): distance metric.
+                Defaults to "euclidean".
+            step_pattern (str, optional): step pattern.
+                Defaults to "symmetric_p0".
+            n_jobs (int, optional): number of worker processes aligning
+                members in parallel. Defaults to None (serial).
+
+        Raises:
+            ValueError: If no sequences are passed
+
+        Returns:
+            np.ndarray: average sequence (2D)
+        """
+        logging.info("Compute DTW barycenter average")
+
+        if len(sequences) == 0:
+            raise ValueError("At least one sequence required")
+
+        if init is None:
+            lengths = [len(self.dtwm.dim_check(x)) for x in sequences]
+            init = sequences[np.argsort(lengths)[len(lengths) // 2]]
+
+        template = np.array(self.dtwm.dim_check(init), dtype=np.double)
+
+        executor = ProcessPoolExecutor(n_jobs) if n_jobs else None
+
+        try:
+            for iteration in range(n_iterations):
+                args = (
+                    repeat(template),
+                    sequences,
+                    repeat(distance_metric),
+                    repeat(step_pattern),
+                )
+                if executor:
+                    results = executor.map(self.dba_alignment, *args)
+                else:
+                    results = map(self.dba_alignment, *args)
+
+                sums = np.zeros(template.shape)
+                counts = np.zeros(template.shape[0])
+                for s, c in results:
+                    sums += s
+                    counts += c
+
+                # samples without aligned members keep their value
+                aligned = counts > 0
+                update = template.copy()
+                update[aligned] = sums[aligned] / counts[aligned, None]
+
+                shift = np.max(np.abs(update - template))
+                template = update
+                logging.debug("DBA iteration %d, shift %f", iteration, shift)
+
+                if shift < tol:
+                    break
+
+        finally:
+            if executor:
+                executor.shutdown()
+
+        return template
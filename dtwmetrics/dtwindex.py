@@ -0,0 +1,322 @@
+"""Subsequence search index over a long haystack.
+
+(c) Daniel Vogler
+
+Subsequence index:
+- cumulative sums of the haystack precomputed once, rolling statistics
+  of any window length in O(M)
+- rolling envelopes of the haystack, cached for the most recently used
+  window lengths
+- optional z-normalization of every candidate window by its rolling
+  statistics
+- lower bounds prune candidate match ends per pattern
+- sub-sequence recurrence only on windows around surviving candidates
+
+References:
+(1) Keogh, Eamonn, and Chotirat Ann Ratanamahatana. Exact indexing of
+    dynamic time warping. Knowledge and Information Systems 7.3, 2005.
+    https://doi.org/10.1007/s10115-004-0154-9
+"""
+import logging
+from collections import OrderedDict
+from typing import Optional, Tuple
+
+import numpy as np
+from scipy.ndimage import maximum_filter1d, minimum_filter1d
+from scipy.signal import argrelextrema
+
+from dtwmetrics.dtwmetrics import DTWMetrics
+
+
+class DTWIndex:
+    """Reusable index of a haystack for sub-sequence search.
+
+    Matches are end indices b with local minima of Δ(b) = D(N, b) below
+    a cutoff, as in DTWMetrics.compute_similar_subsequences. Candidate
+    windows are limited to max_length samples, i.e. matches are
+    identical to the full sub-sequence computation as long as the
+    optimal match ending in b starts within max_length samples.
+    """
+
+    def __init__(
+        self,
+        haystack: np.ndarray,
+        chunk_size: int = 4096,
+        max_envelopes: int = 4,
+    ):
+        """Init.
+
+        Args:
+            haystack (np.ndarray): long sequence to search in
+            chunk_size (int, optional): number of candidates bounded per
+                vectorized step. Defaults to 4096.
+            max_envelopes (int, optional): number of window lengths
+                whose envelopes are cached, each holds two haystack
+                sized arrays. Defaults to 4.
+        """
+        self.dtwm = DTWMetrics()
+        self.haystack = np.asarray(
+            self.dtwm.dim_check(haystack), dtype=np.double
+        )
+        self.chunk_size = chunk_size
+        self.max_envelopes = max_envelopes
+
+        # haystack statistics, shared by all window lengths
+        self.sums = self.cumulative_sums()
+
+        # envelopes per window length, least recently used first
+        self.envelopes = OrderedDict()
+
+        # statistics of the last search
+        self.pruning_stats = {}
+
+    def cumulative_sums(self) -> Tuple[np.ndarray, np.ndarray]:
+        """Compute cumulative sums of the haystack and its square.
+
+        Returns:
+            Tuple[np.ndarray, np.ndarray]: sums of y and y² per feature,
+                shape (M + 1, features) with a leading row of zeros
+        """
+        M, F = self.haystack.shape
+
+        cumsum = np.zeros((M + 1, F))
+        cumsum2 = np.zeros((M + 1, F))
+        np.cumsum(self.haystack, axis=0, out=cumsum[1:])
+        np.cumsum(self.haystack**2, axis=0, out=cumsum2[1:])
+
+        return cumsum, cumsum2
+
+    def envelope(self, window: int) -> Tuple[np.ndarray, np.ndarray]:
+        """Return rolling envelope of the haystack.
+
+        Cached for the max_envelopes most recently used window lengths.
+
+        Args:
+            window (int): window length
+
+        Returns:
+            Tuple[np.ndarray, np.ndarray]: minimum and maximum of the
+                window ending in each haystack index
+        """
+        if window in self.envelopes:
+            self.envelopes.move_to_end(window)
+        else:
+            logging.info("Compute haystack envelope of length %d", window)
+
+            # trailing window [b - window + 1, b]
+            origin = (window - 1) // 2
+            lower = minimum_filter1d(
+                self.haystack, window, axis=0, origin=origin, mode="nearest"
+            )
+            upper = maximum_filter1d(
+                self.haystack, window, axis=0, origin=origin, mode="nearest"
+            )
+            self.envelopes[window] = (lower, upper)
+
+            if len(self.envelopes) > self.max_envelopes:
+                self.envelopes.popitem(last=False)
+
+        return self.envelopes[window]
+
+    def window_stats(self, window: int) -> Tuple[np.ndarray, np.ndarray]:
+        """Return rolling mean and standard deviation of the haystack.
+
+        Derived from the precomputed cumulative sums. Windows clipped at
+        the start of the haystack use the statistics of the first full
+        window.
+
+        Args:
+            window (int): window length
+
+        Returns:
+            Tuple[np.ndarray, np.ndarray]: mean and standard deviation
+                of the window ending in each haystack index
+        """
+        window = min(window, len(self.haystack))
+        mean, std = self.dtwm.rolling_stats(
+            self.haystack, window, sums=self.sums
+        )
+
+        # trailing window [b - window + 1, b]
+        head = window - 1
+        mean = np.concatenate([np.repeat(mean[:1], head, axis=0), mean])
+        std = np.concatenate([np.repeat(std[:1], head, axis=0), std])
+
+        return mean, std
+
+    def point_distance(self, gaps: np.ndarray, distance_metric: str):
+        """Reduce per feature gaps to distances.
+
+        Args:
+            gaps (np.ndarray): non-negative per feature differences
+            distance_metric (str): distance metric
+
+        Raises:
+            ValueError: If no lower bound exists for the metric
+
+        Returns:
+            np.ndarray: distances
+        """
+        if distance_metric == "euclidean":
+            return np.sqrt(np.sum(gaps**2, axis=-1))
+
+        if distance_metric == "sqeuclidean":
+            return np.sum(gaps**2, axis=-1)
+
+        if distance_metric == "cityblock":
+            return np.sum(gaps, axis=-1)
+
+        raise ValueError("No lower bound for distance metric")
+
+    def lower_bounds(
+        self,
+        pattern: np.ndarray,
+        candidates: np.ndarray,
+        window: int,
+        distance_metric: str = "euclidean",
+        scale: Optional[Tuple[np.ndarray, np.ndarray]] = None,
+    ) -> np.ndarray:
+        """Lower bound Δ(b) of windows ending in candidate indices.
+
+        The last pattern sample is aligned to y_b, every other pattern
+        sample to at least one sample within the window, whose distance
+        is at least the distance to the window envelope (1, LB_Keogh).
+
+        Args:
+            pattern (np.ndarray): pattern (2D)
+            candidates (np.ndarray): candidate end indices
+            window (int): window length
+            distance_metric (str, optional): distance metric.
+                Defaults to "euclidean".
+            scale (Tuple[np.ndarray, np.ndarray], optional): mean and
+                (non-zero) standard deviation normalizing the window
+                ending in each index. Defaults to None.
+
+        Returns:
+            np.ndarray: lower bound of each candidate
+        """
+        lower, upper = self.envelope(window)
+        head = pattern[:-1]
+
+        bounds = np.empty(len(candidates))
+        for start in range(0, len(candidates), self.chunk_size):
+            b = candidates[start : start + self.chunk_size]
+            lo = lower[b][:, np.newaxis]
+            up = upper[b][:, np.newaxis]
+            if scale is not None:
+                # normalization is monotone, bounds stay bounds
+                mean = scale[0][b][:, np.newaxis]
+                std = scale[1][b][:, np.newaxis]
+                lo = (lo - mean) / std
+                up = (up - mean) / std
+            gaps = np.maximum(lo - head, 0.0) + np.maximum(head - up, 0.0)
+            bounds[start : start + self.chunk_size] = self.point_distance(
+                gaps, distance_metric
+            ).sum(axis=1)
+
+        return bounds
+
+    def search(
+        self,
+        pattern: np.ndarray,
+        max_cost: float,
+        max_length: Optional[int] = None,
+        distance_metric: str = "euclidean",
+        znorm: bool = False,
+    ) -> Tuple[np.ndarray, np.ndarray]:
+        """Search sub-sequences similar to pattern.
+
+        Candidates are pruned in two stages, by the cost of the last
+        pattern sample and by the envelope lower bound. The symmetric p0
+        sub-sequence recurrence then runs on merged windows around the
+        remaining candidates. Statistics are stored in
+        self.pruning_stats.
+
+        With znorm, the pattern is z-normalized and the window ending in
+        each candidate b is normalized by its own rolling mean and
+        standard deviation, so matches are offset and amplitude
+        invariant. Windows are then computed per candidate.
+
+        Args:
+            pattern (np.ndarray): pattern sequence
+            max_cost (float): cutoff of Δ(b)
+            max_length (int, optional): maximum match length.
+                Defaults to twice the pattern length.
+            distance_metric (str, optional): distance metric
+                ("euclidean", "sqeuclidean" or "cityblock").
+                Defaults to "euclidean".
+            znorm (bool, optional): z-normalize pattern and candidate
+                windows. Defaults to False.
+
+        Returns:
+            Tuple[np.ndarray, np.ndarray]: match end indices and Δ(b),
+                ∞ for pruned indices
+        """
+        logging.info("Search sub-sequences")
+
+        pattern = np.asarray(self.dtwm.dim_check(pattern), dtype=np.double)
+        window = max_length or 2 * len(pattern)
+        M = len(self.haystack)
+
+        haystack = self.haystack
+        scale = None
+        if znorm:
+            pattern = self.dtwm.znorm(pattern)
+            mean, std = self.window_stats(window)
+            std[std == 0.0] = 1.0
+            scale = (mean, std)
+            # y_b normalized by the window ending in b
+            haystack = (self.haystack - mean) / std
+
+        # stage 1: last pattern sample is aligned to y_b
+        gaps = np.abs(haystack - pattern[-1])
+        bound = self.point_distance(gaps, distance_metric)
+        candidates = np.flatnonzero(bound <= max_cost)
+        n_stage_1 = len(candidates)
+
+        # stage 2: envelope lower bound
+        bound = bound[candidates] + self.lower_bounds(
+            pattern, candidates, window, distance_metric, scale
+        )
+        candidates = candidates[bound <= max_cost]
+
+        delta_b = np.full(M, np.inf)
+
+        # merge overlapping candidate windows into segments
+        starts = np.maximum(candidates - window + 1, 0)
+        breaks = np.flatnonzero(starts[1:] > candidates[:-1] + 1) + 1
+        computed = 0
+
+        # every candidate window has its own normalization
+        if znorm:
+            breaks = np.arange(1, len(candidates))
+
+        for segment in np.split(np.arange(len(candidates)), breaks):
+            if len(segment) == 0:
+                continue
+            first = starts[segment[0]]
+            last = candidates[segment[-1]]
+
+            y = self.haystack[first : last + 1]
+            if znorm:
+                y = (y - scale[0][last]) / scale[1][last]
+
+            cm = self.dtwm.cm(pattern, y, distance_metric)
+            acm = self.dtwm.step_symmetric_p0(cm, sequence="sub")
+            delta_b[candidates[segment]] = acm[-1, candidates[segment] - first]
+            computed += cm.size
+
+        self.pruning_stats = {
+            "haystack": M,
+            "candidates_stage_1": n_stage_1,
+            "candidates_stage_2": len(candidates),
+            "computed_cells": computed,
+            "pruned_ratio": 1.0 - computed / (len(pattern) * M),
+        }
+        logging.info("Computed %d of %d cells", computed, len(pattern) * M)
+
+        # local minima, pruned neighbours exceed any match below max_cost
+        b = argrelextrema(delta_b, np.less)[0]
+        b = b[delta_b[b] <= max_cost]
+
+        return b, delta_b
@@ -10,10 +10,17 @@ dtw metrics:
 References:
 (1) Müller, Meinard. Information retrieval for music and motion. Vol. 2.
     Heidelberg: Springer, 2007. https://doi.org/10.1007/978-3-540-74048-3
+(2) Keogh, Eamonn J., and Michael J. Pazzani. Derivative dynamic time
+    warping. Proceedings of the 2001 SIAM International Conference on
+    Data Mining, 2001. https://doi.org/10.1137/1.9781611972719.1
+(3) Silva, Diego F., and Gustavo E. Batista. Speeding up all-pairwise
+    dynamic time warping matrix calculation. Proceedings of the 2016
+    SIAM International Conference on Data Mining, 2016.
+    https://doi.org/10.1137/1.9781611974348.94
 
 """
 import logging
-from typing import Tuple
+from typing import List, Optional, Tuple
 
 import numpy as np
 from scipy.signal import argrelextrema
@@ -25,7 +32,8 @@ class DTWMetrics:
 
     def __init__(self):
         """Init."""
-        return
+        # statistics of the last pruned acm computation
+        self.pruning_stats = {}
 
     def dtwm(
         self,
@@ -34,6 +42,8 @@ class DTWMetrics:
         distance_metric: str = "euclidean",
         step_pattern: str = "symmetric_p0",
         sequence: str = "whole",
+        preprocess: Optional[str] = None,
+        max_cost: Optional[float] = None,
     ) -> Tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
         """Compute dynamic time warping metrics.
 
@@ -45,21 +55,32 @@ class DTWMetrics:
             step_pattern (str, optional): Step pattern of walking path.
                 Defaults to "symmetric_p0".
             sequence (str, optional): _description_. Defaults to "whole".
+            preprocess (str, optional): preprocessing applied to both
+                sequences ("znorm" or "derivative"). Defaults to None.
+            max_cost (float, optional): abandon alignments exceeding this
+                distance. Defaults to None.
 
         Returns:
-            Tuple: Dynamic time warping metrics such as cost matrix
+            Tuple: Dynamic time warping metrics such as cost matrix,
+                owp and warped query are None for abandoned alignments
         """
         logging.info("Compute dynamic time warping metrics")
 
-        cm = self.cm(X=reference, Y=query, distance_metric=distance_metric)
+        # preprocess once, shared by cm and acm
+        X = self.preprocess(reference, preprocess)
+        Y = self.preprocess(query, preprocess)
 
-        acm = self.acm(
-            reference=reference,
-            query=query,
-            distance_metric=distance_metric,
-            step_pattern=step_pattern,
-            sequence=sequence,
-        )
+        cm = self.cm(X=X, Y=Y, distance_metric=distance_metric)
+
+        # function string
+        step_pattern_str = str("step_" + step_pattern)
+        step_pattern_func = getattr(self, step_pattern_str)
+
+        acm = step_pattern_func(cm, sequence=sequence, max_cost=max_cost)
+
+        if self.acm_distance(acm, sequence, max_cost) == np.inf:
+            logging.info("Alignment abandoned")
+            return cm, acm, None, None
 
         # match whole sequence or only sub-sequence
         if sequence == "sub":
@@ -73,6 +94,62 @@ class DTWMetrics:
 
         return cm, acm, owp, warped_query
 
+    def distances(
+        self,
+        reference: np.ndarray,
+        queries: List[np.ndarray],
+        distance_metric: str = "euclidean",
+        step_pattern: str = "symmetric_p0",
+        sequence: str = "whole",
+        preprocess: Optional[str] = None,
+        max_cost: Optional[float] = None,
+    ) -> np.ndarray:
+        """Compute DTW distances of one reference and many queries.
+
+        The reference is preprocessed once and the cost matrices of all
+        queries are computed in a single cdist call.
+
+        Args:
+            reference (np.ndarray): reference sequence
+            queries (List[np.ndarray]): query sequences
+            distance_metric (str, optional): distance metric.
+                Defaults to "euclidean".
+            step_pattern (str, optional): step pattern.
+                Defaults to "symmetric_p0".
+            sequence (str, optional): whole or part of sequence.
+                Defaults to "whole".
+            preprocess (str, optional): preprocessing applied to all
+                sequences. Defaults to None.
+            max_cost (float, optional): abandon alignments exceeding this
+                distance, their distance is ∞. Defaults to None.
+
+        Returns:
+            np.ndarray: distance D(N, M) of each query, min Δ(b) for
+                sub-sequences
+        """
+        logging.info("Compute distances of %d queries", len(queries))
+
+        X = self.dim_check(self.preprocess(reference, preprocess))
+        Ys = [self.dim_check(self.preprocess(y, preprocess)) for y in queries]
+
+        cm = self.cm(X, np.concatenate(Ys), distance_metric)
+        offsets = np.cumsum([0] + [len(y) for y in Ys])
+
+        # function string
+        step_pattern_str = str("step_" + step_pattern)
+        step_pattern_func = getattr(self, step_pattern_str)
+
+        distances = np.empty(len(Ys))
+        for k in range(len(Ys)):
+            acm = step_pattern_func(
+                cm[:, offsets[k] : offsets[k + 1]],
+                sequence=sequence,
+                max_cost=max_cost,
+            )
+            distances[k] = self.acm_distance(acm, sequence, max_cost)
+
+        return distances
+
     def compute_similar_subsequences(
         self, acm: np.ndarray
     ) -> Tuple[np.ndarray, np.ndarray]:
@@ -107,6 +184,142 @@ class DTWMetrics:
 
         return b, delta_b
 
+    def preprocess(
+        self, x: np.ndarray, method: Optional[str] = None
+    ) -> np.ndarray:
+        """Preprocess sequence before alignment.
+
+        At most one working buffer is allocated; the transformation is
+        applied in place on that buffer.
+
+        Args:
+            x (np.ndarray): input sequence
+            method (str, optional): "znorm", "derivative" or None.
+                Defaults to None.
+
+        Raises:
+            ValueError: If preprocessing method is undefined
+
+        Returns:
+            np.ndarray: preprocessed sequence (2D, one column per feature)
+        """
+        if method is None or method == "none":
+            return x
+
+        logging.info("Preprocess sequence with %s", method)
+
+        if method == "znorm":
+            x = np.array(self.dim_check(x), dtype=np.double)
+            return self.znorm(x, out=x)
+
+        if method == "derivative":
+            return self.derivative(self.dim_check(x))
+
+        raise ValueError("Undefined preprocessing method")
+
+    def znorm(
+        self, x: np.ndarray, out: Optional[np.ndarray] = None
+    ) -> np.ndarray:
+        """Z-normalize sequence per feature.
+
+        Constant features are only centred to avoid division by zero.
+
+        Args:
+            x (np.ndarray): input sequence (2D)
+            out (np.ndarray, optional): output buffer, may be x itself.
+                Defaults to None.
+
+        Returns:
+            np.ndarray: z-normalized sequence
+        """
+        mean = x.mean(axis=0)
+        std = x.std(axis=0)
+        std[std == 0.0] = 1.0
+
+        out = np.subtract(x, mean, out=out)
+        out /= std
+
+        return out
+
+    def derivative(self, x: np.ndarray) -> np.ndarray:
+        """Estimate derivative of sequence per feature.
+
+        From (2):
+        D_x[q] = ((q_i - q_{i-1}) + (q_{i+1} - q_{i-1}) / 2) / 2
+        with the first and last estimate copied from their neighbours.
+
+        Args:
+            x (np.ndarray): input sequence (2D)
+
+        Returns:
+            np.ndarray: derivative estimate
+        """
+        x = np.asarray(x, dtype=np.double)
+        N = x.shape[0]
+        out = np.zeros_like(x)
+
+        if N < 3:
+            return out
+
+        # (q_i - q_{i-1}) / 2
+        np.subtract(x[1:-1], x[:-2], out=out[1:-1])
+        out[1:-1] *= 0.5
+        # + (q_{i+1} - q_{i-1}) / 4
+        out[1:-1] += 0.25 * x[2:]
+        out[1:-1] -= 0.25 * x[:-2]
+
+        # B.C.
+        out[0] = out[1]
+        out[-1] = out[-2]
+
+        return out
+
+    def rolling_stats(
+        self,
+        x: np.ndarray,
+        window: int,
+        sums: Optional[Tuple[np.ndarray, np.ndarray]] = None,
+    ) -> Tuple[np.ndarray, np.ndarray]:
+        """Compute running mean and standard deviation of all windows.
+
+        Uses cumulative sums of x and x², so the statistics of every
+        window cost O(1) per sample instead of renormalizing each window.
+
+        Args:
+            x (np.ndarray): input sequence
+            window (int): window length
+            sums (Tuple[np.ndarray, np.ndarray], optional): precomputed
+                cumulative sums of x and x² per feature with a leading
+                row of zeros, reused for any window length.
+                Defaults to None.
+
+        Raises:
+            ValueError: If window is longer than sequence
+
+        Returns:
+            Tuple[np.ndarray, np.ndarray]: mean and standard deviation,
+                shape (len(x) - window + 1, features)
+        """
+        if sums is None:
+            x = np.asarray(self.dim_check(x), dtype=np.double)
+            cumsum = np.zeros((x.shape[0] + 1, x.shape[1]))
+            cumsum2 = np.zeros((x.shape[0] + 1, x.shape[1]))
+            np.cumsum(x, axis=0, out=cumsum[1:])
+            np.cumsum(x * x, axis=0, out=cumsum2[1:])
+        else:
+            cumsum, cumsum2 = sums
+        N = cumsum.shape[0] - 1
+
+        if window < 1 or window > N:
+            raise ValueError("Window length must be in [1, sequence length]")
+
+        mean = (cumsum[window:] - cumsum[:-window]) / window
+        var = (cumsum2[window:] - cumsum2[:-window]) / window - mean**2
+        # cancellation may yield tiny negative variances
+        np.maximum(var, 0.0, out=var)
+
+        return mean, np.sqrt(var)
+
     # cost matrix calculation
     def cm(
         self,
@@ -201,6 +414,8 @@ class DTWMetrics:
         distance_metric="euclidean",
         step_pattern="symmetric_p0",
         sequence="whole",
+        preprocess: Optional[str] = None,
+        max_cost: Optional[float] = None,
     ) -> np.ndarray:
         """Generate accumulated cost matrix.
 
@@ -213,6 +428,11 @@ class DTWMetrics:
                 Defaults to "symmetric_p0".
             sequence (str, optional): whole or part of sequence.
                 Defaults to "whole".
+            preprocess (str, optional): preprocessing applied to both
+                sequences ("znorm" or "derivative"). Defaults to None.
+            max_cost (float, optional): abandon the computation once the
+                distance is known to exceed max_cost. Abandoned matrices
+                have acm[-1, -1] == ∞. Defaults to None.
 
         Returns:
             np.ndarray: accumulated cost matrix
@@ -221,6 +441,9 @@ class DTWMetrics:
             "Computing accumulated cost matrix with %s", distance_metric
         )
 
+        reference = self.preprocess(reference, preprocess)
+        query = self.preprocess(query, preprocess)
+
         cm = self.cm(reference, query, distance_metric)
 
         # function string
@@ -228,12 +451,15 @@ class DTWMetrics:
         step_pattern_func = getattr(self, step_pattern_str)
 
         # execute step path
-        acm = step_pattern_func(cm, sequence=sequence)
+        acm = step_pattern_func(cm, sequence=sequence, max_cost=max_cost)
 
         return acm
 
     def step_symmetric_p0(
-        self, cm: np.ndarray, sequence="whole"
+        self,
+        cm: np.ndarray,
+        sequence="whole",
+        max_cost: Optional[float] = None,
     ) -> np.ndarray:
         """Compute accumulated cost matrix for symmetric p0 pattern.
 
@@ -241,6 +467,8 @@ class DTWMetrics:
             cm (np.ndarray): cost matrix
             sequence (str, optional): sequence part.
                 Defaults to "whole".
+            max_cost (float, optional): abandon once every cell of a row
+                exceeds max_cost. Defaults to None.
 
         Raises:
             Exception: If sequence type is undefined
@@ -280,6 +508,9 @@ class DTWMetrics:
         else:
             raise ValueError("Undefined sequence type")
 
+        if self.early_abandon(acm, 0, 0, max_cost, sequence):
+            return acm
+
         # for 1 < n ≤ N and 1 < m ≤ M .
         # D(n, m) = min{D(n − 1, m − 1), D(n − 1, m),
         #   D(n, m − 1)} + c(x_n , y_m )
@@ -289,15 +520,228 @@ class DTWMetrics:
                     acm[n - 1, m], acm[n, m - 1], acm[n - 1, m - 1]
                 )
 
+            # every path passes through row n
+            if self.early_abandon(acm, n, n, max_cost, sequence):
+                return acm
+
+        return acm
+
+    def early_abandon(
+        self,
+        acm: np.ndarray,
+        n: int,
+        first_row: int,
+        max_cost: Optional[float],
+        sequence: str = "whole",
+    ) -> bool:
+        """Abandon acm computation if the distance exceeds max_cost.
+
+        Costs are non-negative, so D(N, M) and every Δ(b) are at least
+        the minimum of any set of rows that every warping path passes
+        through. If that minimum (or the final distance) exceeds
+        max_cost, the remaining rows are set to ∞. For whole sequences
+        acm[-1, -1] is set to ∞ as well, a computed last row of
+        sub-sequences keeps its Δ(b).
+
+        Args:
+            acm (np.ndarray): accumulated cost matrix, computed up to row n
+            n (int): last computed row
+            first_row (int): first row of the rows every path passes
+            max_cost (float, optional): cutoff, None never abandons
+            sequence (str, optional): whole or part of sequence.
+                Defaults to "whole".
+
+        Returns:
+            bool: True if abandoned
+        """
+        if max_cost is None:
+            return False
+
+        if acm[first_row : n + 1].min() <= max_cost:
+            if n < acm.shape[0] - 1:
+                return False
+            if self.acm_distance(acm, sequence) <= max_cost:
+                return False
+
+        logging.info("Abandon acm computation after row %d", n)
+        acm[n + 1 :] = np.inf
+        if sequence == "whole":
+            acm[-1, -1] = np.inf
+
+        return True
+
+    def acm_distance(
+        self,
+        acm: np.ndarray,
+        sequence: str = "whole",
+        max_cost: Optional[float] = None,
+    ) -> float:
+        """Read distance from accumulated cost matrix.
+
+        Args:
+            acm (np.ndarray): accumulated cost matrix
+            sequence (str, optional): whole or part of sequence.
+                Defaults to "whole".
+            max_cost (float, optional): cutoff, None never abandons.
+                Defaults to None.
+
+        Returns:
+            float: D(N, M), min Δ(b) for sub-sequences, ∞ if it exceeds
+                max_cost
+        """
+        if sequence == "sub":
+            distance = float(acm[-1].min())
+        else:
+            distance = float(acm[-1, -1])
+
+        if max_cost is not None and distance > max_cost:
+            return np.inf
+
+        return distance
+
+    def upper_bound(self, cm: np.ndarray) -> float:
+        """Compute upper bound of the whole sequence DTW distance.
+
+        Cost of the diagonal (N == M) or the closest monotone path to
+        the diagonal (N != M). Summed sequentially like the recurrence,
+        so the bound also holds in floating point.
+
+        Args:
+            cm (np.ndarray): cost matrix
+
+        Returns:
+            float: upper bound of D(N, M)
+        """
+        N, M = cm.shape
+        K = max(N, M)
+
+        if K == 1:
+            return cm[0, 0]
+
+        k = np.arange(K)
+        n = np.rint(k * (N - 1) / (K - 1)).astype(int)
+        m = np.rint(k * (M - 1) / (K - 1)).astype(int)
+
+        return np.cumsum(cm[n, m])[-1]
+
+    def step_symmetric_p0_pruned(
+        self,
+        cm: np.ndarray,
+        sequence: str = "whole",
+        upper_bound: Optional[float] = None,
+        max_cost: Optional[float] = None,
+    ) -> np.ndarray:
+        """Compute accumulated cost matrix for symmetric p0 with pruning.
+
+        From (3): cells whose accumulated cost exceeds an upper bound of
+        D(N, M) cannot be part of the optimal warping path. Each row is
+        only computed within the live column range of the previous row.
+        Pruned cells are set to ∞, acm[-1, -1] and the optimal warping
+        path are identical to step_symmetric_p0. Pruning statistics are
+        stored in self.pruning_stats.
+
+        Args:
+            cm (np.ndarray): cost matrix (non-negative)
+            sequence (str, optional): sequence part. Only "whole" is
+                pruned, "sub" falls back to step_symmetric_p0.
+                Defaults to "whole".
+            upper_bound (float, optional): upper bound of D(N, M).
+                Defaults to self.upper_bound(cm).
+            max_cost (float, optional): abandon alignments exceeding
+                max_cost, used as upper bound if lower. Defaults to None.
+
+        Returns:
+            np.ndarray: accumulated cost matrix
+        """
+        logging.info(
+            "Compute pruned accumulated cost matrix for symmetric p0 pattern"
+        )
+
+        if sequence != "whole":
+            logging.info("Pruning only applies to whole sequences")
+            return self.step_symmetric_p0(
+                cm, sequence=sequence, max_cost=max_cost
+            )
+
+        N, M = cm.shape
+
+        if upper_bound is None:
+            upper_bound = self.upper_bound(cm)
+
+        # pruning by the cutoff abandons early, D(N, M) stays ∞
+        if max_cost is not None:
+            upper_bound = min(upper_bound, max_cost)
+
+        # pruned cells stay infinite
+        acm = np.full([N, M], np.inf)
+
+        # first row up to the first dead cell
+        acc = 0.0
+        for m in range(M):
+            acc += cm[0, m]
+            if acc > upper_bound:
+                break
+            acm[0, m] = acc
+
+        computed = m + 1
+        start = 0
+        end = m - 1 if acc > upper_bound else M - 1
+
+        for n in range(1, N):
+            new_start = None
+            new_end = -1
+
+            for m in range(start, M):
+                left = acm[n, m - 1] if m > 0 else np.inf
+
+                # past the diagonal of the previous row's last live cell
+                # only the left cell is reachable
+                if m > end + 1 and left == np.inf:
+                    break
+
+                diag = acm[n - 1, m - 1] if m > 0 else np.inf
+                cost = cm[n, m] + min(acm[n - 1, m], left, diag)
+                computed += 1
+
+                if cost <= upper_bound:
+                    acm[n, m] = cost
+                    new_end = m
+                    if new_start is None:
+                        new_start = m
+
+            # no live cell left, only possible for invalid bounds or if
+            # the distance exceeds max_cost
+            if new_start is None:
+                break
+
+            start = new_start
+            end = new_end
+
+        self.pruning_stats = {
+            "upper_bound": upper_bound,
+            "cells": N * M,
+            "computed": computed,
+            "pruned": N * M - computed,
+            "pruned_ratio": 1.0 - computed / (N * M),
+        }
+        logging.info(
+            "Pruned %.1f%% of cells", 100 * (1.0 - computed / (N * M))
+        )
+
         return acm
 
     def step_symmetric_p1(
-        self, cm: np.ndarray, sequence: str = "whole"
+        self,
+        cm: np.ndarray,
+        sequence: str = "whole",
+        max_cost: Optional[float] = None,
     ) -> np.ndarray:
         """Compute accumulated cost matrix for symmetric p1 pattern.
 
         Args:
             cm (np.ndarray): cost matrix
+            max_cost (float, optional): abandon once every cell of two
+                consecutive rows exceeds max_cost. Defaults to None.
 
         Raises:
             Exception: If sequence type is undefined
@@ -361,6 +805,10 @@ class DTWMetrics:
                     + cm[n, m]
                 )
 
+            # steps skip at most one row, every path passes row n - 1 or n
+            if self.early_abandon(acm, n, n - 1, max_cost, sequence):
+                return acm
+
         return acm
 
     def optimal_warping_path(self, acm: np.ndarray, b=None) -> np.ndarray:
@@ -402,12 +850,12 @@ class DTWMetrics:
         p.append([N, M])
 
         # compute in reverse order
-        # From (1) Algorithm: OptimalWarpingPath
-        while n > 0 and m > 0:
+        # From (1) Algorithm: OptimalWarpingPath, 0-based boundaries
+        while n > 0 or m > 0:
             # check if acm bounds are reached
-            if n == 1:
+            if n == 0:
                 m = m - 1
-            elif m == 1:
+            elif m == 0:
                 n = n - 1
             else:
                 # compute direction of optimal step
@@ -429,10 +877,8 @@ class DTWMetrics:
             # append indices of optimal step
             p.append([n, m])
 
-        # B.C.
-        p.append([0, 0])
-
-        owp = np.asarray(p)
+        # B.C., reached by the loop unless N == M == 1
+        owp = np.asarray(p if len(p) > 1 else p + [[0, 0]])
         owp = np.flip(owp)
 
         return owp
@@ -0,0 +1,289 @@
+"""Online dynamic time warping for growing queries.
+
+(c) Daniel Vogler
+
+Online alignment:
+- extend cost and accumulated cost matrix by new query samples
+- updated distance per update
+- optimal warping path on demand
+"""
+import logging
+from typing import Optional
+
+import numpy as np
+from scipy.spatial.distance import cdist
+
+from dtwmetrics.dtwmetrics import DTWMetrics
+
+
+class DTWOnline:
+    """Stateful aligner of a fixed reference and a growing query.
+
+    Each update only computes the accumulated cost matrix columns of the
+    new query samples, i.e. O(N·Δ) instead of O(N·M) per update. The
+    columns match DTWMetrics.acm on the full query.
+    """
+
+    def __init__(
+        self,
+        reference: np.ndarray,
+        distance_metric: str = "euclidean",
+        step_pattern: str = "symmetric_p0",
+        sequence: str = "whole",
+        keep_path: bool = True,
+        max_cost: Optional[float] = None,
+    ):
+        """Init.
+
+        Args:
+            reference (np.ndarray): reference sequence
+            distance_metric (str, optional): distance metric.
+                Defaults to "euclidean".
+            step_pattern (str, optional): step pattern ("symmetric_p0"
+                or "symmetric_p1"). Defaults to "symmetric_p0".
+            sequence (str, optional): whole or part of sequence.
+                Defaults to "whole".
+            keep_path (bool, optional): keep all acm columns so that the
+                optimal warping path can be computed. Otherwise only the
+                last two columns are kept. Defaults to True.
+            max_cost (float, optional): report distances exceeding
+                max_cost as ∞. Whole sequence alignments are abandoned
+                once every path through the last columns exceeds it,
+                later updates skip the recurrence. Defaults to None.
+
+        Raises:
+            ValueError: If step pattern or sequence type is undefined
+        """
+        if step_pattern not in ("symmetric_p0", "symmetric_p1"):
+            raise ValueError("Undefined step pattern")
+
+        if sequence not in ("whole", "sub"):
+            raise ValueError("Undefined sequence type")
+
+        self.dtwm = DTWMetrics()
+        self.reference = self.dtwm.dim_check(reference)
+        self.options = {
+            "distance_metric": distance_metric,
+            "step_pattern": step_pattern,
+            "sequence": sequence,
+            "keep_path": keep_path,
+            "max_cost": max_cost,
+        }
+
+        # alignment state, see reset
+        self.M = 0
+        self.columns = None
+        self.abandoned = False
+
+        self.reset()
+
+    def reset(self) -> None:
+        """Drop all query samples."""
+        N = self.reference.shape[0]
+
+        # number of query samples seen
+        self.M = 0
+        # acm columns, capacity grows by doubling
+        self.columns = np.full(
+            (N, 16 if self.options["keep_path"] else 2), np.inf
+        )
+        self.abandoned = False
+
+    @property
+    def acm(self) -> np.ndarray:
+        """Accumulated cost matrix of all query samples seen.
+
+        Raises:
+            ValueError: If columns are not kept
+
+        Returns:
+            np.ndarray: accumulated cost matrix
+        """
+        if not self.options["keep_path"]:
+            raise ValueError("Accumulated cost matrix is not kept")
+
+        return self.columns[:, : self.M]
+
+    @property
+    def distance(self) -> float:
+        """Current DTW distance, i.e. D(N, M).
+
+        Returns:
+            float: distance, inf before the first update or if it
+                exceeds max_cost
+        """
+        if self.M == 0 or self.abandoned:
+            return np.inf
+
+        distance = self.last_columns()[-1, 1]
+        max_cost = self.options["max_cost"]
+
+        if max_cost is not None and distance > max_cost:
+            return np.inf
+
+        return distance
+
+    def update(self, samples: np.ndarray) -> float:
+        """Extend alignment by new query samples.
+
+        Args:
+            samples (np.ndarray): new query samples, shape (Δ, F) or
+                (F,) for a single sample
+
+        Returns:
+            float: updated distance
+        """
+        # a single multi-feature sample must not be transposed
+        samples = np.asarray(samples, dtype=np.double).reshape(
+            -1, self.reference.shape[1]
+        )
+        # DTWMetrics.cm would transpose the (1, F) sample again
+        cm = cdist(
+            self.reference, samples, metric=self.options["distance_metric"]
+        )
+
+        N, delta = cm.shape
+
+        # abandoned columns stay infinite
+        if self.abandoned:
+            self.store(np.full((N, delta), np.inf))
+            return self.distance
+
+        logging.debug("Extend acm by %d columns", delta)
+
+        # previous two columns followed by the new columns
+        cols = np.empty((N, delta + 2))
+        cols[:, :2] = self.last_columns()
+
+        step_func = getattr(self, "column_" + self.options["step_pattern"])
+        for k in range(delta):
+            step_func(cols, k + 2, self.M + k, cm[:, k])
+
+        self.store(cols[:, 2:])
+
+        if (
+            self.options["max_cost"] is not None
+            and self.options["sequence"] == "whole"
+        ):
+            self.early_abandon()
+
+        return self.distance
+
+    def early_abandon(self) -> None:
+        """Abandon alignment if every future distance exceeds max_cost.
+
+        Steps advance at most one (p0) or two (p1) columns, so every
+        path to a later column passes through the last one or two
+        columns. Costs are non-negative, i.e. their minimum is a lower
+        bound of every future D(N, M).
+        """
+        last = self.last_columns()
+        if self.options["step_pattern"] == "symmetric_p0":
+            last = last[:, 1:]
+
+        if last.min() > self.options["max_cost"]:
+            logging.info("Abandon online alignment after %d samples", self.M)
+            self.abandoned = True
+
+    def last_columns(self) -> np.ndarray:
+        """Return last two acm columns (padded with inf).
+
+        Returns:
+            np.ndarray: columns M - 2 and M - 1
+        """
+        if not self.options["keep_path"]:
+            return self.columns
+
+        last = np.full((self.columns.shape[0], 2), np.inf)
+        n_prev = min(self.M, 2)
+
+        if n_prev:
+            last[:, 2 - n_prev :] = self.columns[:, self.M - n_prev : self.M]
+
+        return last
+
+    def store(self, new: np.ndarray) -> None:
+        """Store new acm columns.
+
+        Args:
+            new (np.ndarray): new columns
+        """
+        delta = new.shape[1]
+
+        if self.options["keep_path"]:
+            if self.M + delta > self.columns.shape[1]:
+                capacity = max(2 * self.columns.shape[1], self.M + delta)
+                grown = np.empty((self.columns.shape[0], capacity))
+                grown[:, : self.M] = self.columns[:, : self.M]
+                self.columns = grown
+            self.columns[:, self.M : self.M + delta] = new
+        else:
+            cols = np.concatenate([self.columns, new], axis=1)
+            self.columns = cols[:, -2:].copy()
+
+        self.M += delta
+
+    def column_symmetric_p0(
+        self, cols: np.ndarray, k: int, m: int, c: np.ndarray
+    ) -> None:
+        """Compute acm column for symmetric p0 pattern.
+
+        Same recurrence as DTWMetrics.step_symmetric_p0.
+
+        Args:
+            cols (np.ndarray): column buffer, k - 1 holds column m - 1
+            k (int): buffer index of the new column
+            m (int): query index of the new column
+            c (np.ndarray): cost matrix column
+        """
+        col = cols[:, k]
+        prev = cols[:, k - 1]
+
+        if m == 0:
+            np.cumsum(c, out=col)
+            return
+
+        if self.options["sequence"] == "whole":
+            col[0] = prev[0] + c[0]
+        else:
+            col[0] = c[0]
+
+        for n in range(1, len(c)):
+            col[n] = c[n] + min(col[n - 1], prev[n], prev[n - 1])
+
+    def column_symmetric_p1(
+        self, cols: np.ndarray, k: int, m: int, c: np.ndarray
+    ) -> None:
+        """Compute acm column for symmetric p1 pattern.
+
+        Same recurrence and boundaries as DTWMetrics.step_symmetric_p1.
+
+        Args:
+            cols (np.ndarray): column buffer, k - 2 and k - 1 hold
+                columns m - 2 and m - 1
+            k (int): buffer index of the new column
+            m (int): query index of the new column
+            c (np.ndarray): cost matrix column
+        """
+        col = cols[:, k]
+        col[:] = np.inf
+
+        if m == 0:
+            col[0] = 0
+        elif m == 1:
+            col[1] = c[1]
+        else:
+            prev = cols[:, k - 1]
+            prev2 = cols[:, k - 2]
+            col[2:] = (
+                np.minimum(np.minimum(prev[1:-1], prev[:-2]), prev2[1:-1])
+                + c[2:]
+            )
+
+    def optimal_warping_path(self) -> np.ndarray:
+        """Compute optimal warping path of all query samples seen.
+
+        Returns:
+            np.ndarray: optimal warping path
+        """
+        return self.dtwm.optimal_warping_path(self.acm)
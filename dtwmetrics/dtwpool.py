@@ -0,0 +1,302 @@
+"""Shared memory worker pool for multi-process alignment.
+
+(c) Daniel Vogler
+
+Worker pool:
+- sequence bank packed into one shared memory buffer
+- workers receive only index ranges, no arrays are pickled
+- distances and paths written into preallocated shared output arrays
+"""
+import logging
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import shared_memory
+from typing import List, Optional, Tuple
+
+import numpy as np
+
+from dtwmetrics.dtwmetrics import DTWMetrics
+
+# per process state of the pool workers
+WORKER_STATE = {}
+
+
+def create_shared(shape: tuple, dtype) -> Tuple[object, np.ndarray]:
+    """Create shared memory array.
+
+    Args:
+        shape (tuple): array shape
+        dtype: array dtype
+
+    Returns:
+        Tuple[object, np.ndarray]: shared memory block and array view
+    """
+    nbytes = max(1, int(np.prod(shape)) * np.dtype(dtype).itemsize)
+    shm = shared_memory.SharedMemory(create=True, size=nbytes)
+
+    return shm, np.ndarray(shape, dtype=dtype, buffer=shm.buf)
+
+
+def attach_shared(spec: Tuple[str, tuple, str]) -> Tuple[object, np.ndarray]:
+    """Attach to shared memory array.
+
+    Args:
+        spec (Tuple[str, tuple, str]): name, shape and dtype
+
+    Returns:
+        Tuple[object, np.ndarray]: shared memory block and array view
+    """
+    name, shape, dtype = spec
+    shm = shared_memory.SharedMemory(name=name)
+
+    return shm, np.ndarray(shape, dtype=dtype, buffer=shm.buf)
+
+
+def init_worker(bank: Tuple[str, tuple, str], offsets: np.ndarray, options):
+    """Initialize pool worker.
+
+    Args:
+        bank (Tuple[str, tuple, str]): shared sequence bank
+        offsets (np.ndarray): start of each sequence in the bank
+        options (dict): alignment options
+    """
+    WORKER_STATE["dtwm"] = DTWMetrics()
+    WORKER_STATE["bank"] = attach_shared(bank)
+    WORKER_STATE["offsets"] = offsets
+    WORKER_STATE["options"] = options
+
+
+def align_range(start: int, end: int, buffers: dict) -> None:
+    """Align pairs start to end and write results to shared outputs.
+
+    Args:
+        start (int): first pair
+        end (int): end of pairs
+        buffers (dict): shared arrays of pairs, distances and paths
+    """
+    dtwm = WORKER_STATE["dtwm"]
+    bank = WORKER_STATE["bank"][1]
+    offsets = WORKER_STATE["offsets"]
+    options = WORKER_STATE["options"]
+
+    blocks = {}
+    arrays = {}
+    for name, spec in buffers.items():
+        blocks[name], arrays[name] = attach_shared(spec)
+
+    try:
+        for k in range(start, end):
+            i, j = arrays["pairs"][k]
+            acm = dtwm.acm(
+                bank[offsets[i] : offsets[i + 1]],
+                bank[offsets[j] : offsets[j + 1]],
+                **options,
+            )
+            arrays["distances"][k] = dtwm.acm_distance(
+                acm, options["sequence"], options["max_cost"]
+            )
+
+            if "paths" not in arrays:
+                continue
+
+            # abandoned alignments have no path
+            if arrays["distances"][k] == np.inf:
+                arrays["path_lengths"][k] = 0
+                continue
+
+            owp = dtwm.optimal_warping_path(acm)
+            first = arrays["path_offsets"][k]
+            arrays["paths"][first : first + len(owp)] = owp
+            arrays["path_lengths"][k] = len(owp)
+    finally:
+        # views must be released before the blocks are closed
+        arrays.clear()
+        for shm in blocks.values():
+            shm.close()
+
+
+class DTWPool:
+    """Process pool aligning sequences of a shared memory bank.
+
+    Example:
+        with DTWPool(sequences, n_workers=4) as pool:
+            distances = pool.distances([(0, 1), (0, 2)])
+    """
+
+    def __init__(
+        self,
+        sequences: List[np.ndarray],
+        n_workers: Optional[int] = None,
+        chunk_size: int = 64,
+        distance_metric: str = "euclidean",
+        step_pattern: str = "symmetric_p0",
+        sequence: str = "whole",
+        preprocess: Optional[str] = None,
+        max_cost: Optional[float] = None,
+    ):
+        """Init.
+
+        Args:
+            sequences (List[np.ndarray]): sequence bank
+            n_workers (int, optional): number of worker processes.
+                Defaults to the number of CPUs.
+            chunk_size (int, optional): pairs per task. Defaults to 64.
+            distance_metric (str, optional): distance metric.
+                Defaults to "euclidean".
+            step_pattern (str, optional): step pattern.
+                Defaults to "symmetric_p0".
+            sequence (str, optional): whole or part of sequence.
+                Defaults to "whole".
+            preprocess (str, optional): preprocessing of all sequences.
+                Defaults to None.
+            max_cost (float, optional): abandon alignments exceeding
+                this distance, their distance is ∞. Defaults to None.
+
+        Raises:
+            ValueError: If sequences differ in number of features
+        """
+        dtwm = DTWMetrics()
+        sequences = [dtwm.dim_check(x) for x in sequences]
+
+        if len({x.shape[1] for x in sequences}) > 1:
+            raise ValueError("Sequences differ in number of features")
+
+        self.lengths = np.array([len(x) for x in sequences])
+        self.offsets = np.concatenate([[0], np.cumsum(self.lengths)])
+        self.chunk_size = chunk_size
+
+        # pack bank once, workers attach by name
+        self.bank_shm, bank = create_shared(
+            (self.offsets[-1], sequences[0].shape[1]), np.double
+        )
+        for k, x in enumerate(sequences):
+            bank[self.offsets[k] : self.offsets[k + 1]] = x
+        del bank
+
+        logging.info(
+            "Shared bank of %d sequences (%d bytes)",
+            len(sequences),
+            self.bank_shm.size,
+        )
+
+        spec = (
+            self.bank_shm.name,
+            (self.offsets[-1], sequences[0].shape[1]),
+            "float64",
+        )
+        options = {
+            "distance_metric": distance_metric,
+            "step_pattern": step_pattern,
+            "sequence": sequence,
+            "preprocess": preprocess,
+            "max_cost": max_cost,
+        }
+        self.executor = ProcessPoolExecutor(
+            n_workers,
+            initializer=init_worker,
+            initargs=(spec, self.offsets, options),
+        )
+
+    def __enter__(self) -> "DTWPool":
+        """Enter context."""
+        return self
+
+    def __exit__(self, *exc) -> None:
+        """Exit context."""
+        self.close()
+
+    def close(self) -> None:
+        """Shut down workers and release shared bank."""
+        self.executor.shutdown()
+        self.bank_shm.close()
+        self.bank_shm.unlink()
+
+    def distances(self, pairs, paths: bool = False):
+        """Align pairs of bank sequences.
+
+        Args:
+            pairs: (reference index, query index) of each pair
+            paths (bool, optional): also return optimal warping paths.
+                Defaults to False.
+
+        Returns:
+            np.ndarray: distances, plus list of paths if requested
+        """
+        pairs = np.asarray(pairs, dtype=np.int64).reshape(-1, 2)
+        n_pairs = len(pairs)
+
+        blocks = {}
+        arrays = {}
+        try:
+            for name, shape, dtype in self.output_specs(pairs, paths):
+                blocks[name], arrays[name] = create_shared(shape, dtype)
+            arrays["pairs"][:] = pairs
+
+            if paths:
+                # a path has at most N + M entries
+                sizes = self.lengths[pairs].sum(axis=1) + 1
+                arrays["path_offsets"][1:] = np.cumsum(sizes)
+                arrays["path_offsets"][0] = 0
+
+            buffers = {
+                name: (blocks[name].name, array.shape, array.dtype.str)
+                for name, array in arrays.items()
+            }
+
+            tasks = [
+                self.executor.submit(
+                    align_range,
+                    start,
+                    min(start + self.chunk_size, n_pairs),
+                    buffers,
+                )
+                for start in range(0, n_pairs, self.chunk_size)
+            ]
+            for task in tasks:
+                task.result()
+
+            distances = arrays["distances"].copy()
+
+            if not paths:
+                return distances
+
+            owps = [
+                arrays["paths"][first : first + length].copy()
+                for first, length in zip(
+                    arrays["path_offsets"], arrays["path_lengths"]
+                )
+            ]
+
+            return distances, owps
+
+        finally:
+            # views must be released before the blocks are closed
+            arrays.clear()
+            for shm in blocks.values():
+                shm.close()
+                shm.unlink()
+
+    def output_specs(self, pairs: np.ndarray, paths: bool) -> list:
+        """List shared arrays of a distances call.
+
+        Args:
+            pairs (np.ndarray): pairs
+            paths (bool): paths requested
+
+        Returns:
+            list: name, shape and dtype of each array
+        """
+        n_pairs = len(pairs)
+        specs = [
+            ("pairs", pairs.shape, np.int64),
+            ("distances", (n_pairs,), np.double),
+        ]
+
+        if paths:
+            n_entries = int(self.lengths[pairs].sum()) + n_pairs
+            specs += [
+                ("paths", (n_entries, 2), np.int64),
+                ("path_offsets", (n_pairs + 1,), np.int64),
+                ("path_lengths", (n_pairs,), np.int64),
+            ]
+
+        return specs
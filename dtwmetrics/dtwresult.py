@@ -0,0 +1,343 @@
+"""Alignment result with lazy attributes and compact serialization.
+
+(c) Daniel Vogler
+
+Alignment result:
+- cost matrix, accumulated cost matrix, optimal warping path, warped
+  query and distance computed on first access
+- only requested attributes are kept
+- compact npz encoding with run-length encoded path and optional
+  float16/float32 matrices
+"""
+import json
+import logging
+from typing import Iterable, Optional, Tuple
+
+import numpy as np
+
+from dtwmetrics.dtwmetrics import DTWMetrics
+
+ATTRIBUTES = ("cm", "acm", "owp", "warped_query", "distance")
+
+
+class DTWResult:
+    """Lazy result of aligning reference and query.
+
+    Attributes are computed on first access and cached. Intermediate
+    matrices needed for the distance or path are dropped unless they
+    are listed in keep or were accessed.
+    """
+
+    def __init__(
+        self,
+        reference: Optional[np.ndarray] = None,
+        query: Optional[np.ndarray] = None,
+        distance_metric: str = "euclidean",
+        step_pattern: str = "symmetric_p0",
+        sequence: str = "whole",
+        preprocess: Optional[str] = None,
+        max_cost: Optional[float] = None,
+        keep: Iterable[str] = ("distance", "owp"),
+    ):
+        """Init.
+
+        Args:
+            reference (np.ndarray, optional): sequence 1. Defaults to
+                None (loaded results).
+            query (np.ndarray, optional): sequence 2. Defaults to None.
+            distance_metric (str, optional): distance metric.
+                Defaults to "euclidean".
+            step_pattern (str, optional): step pattern.
+                Defaults to "symmetric_p0".
+            sequence (str, optional): whole or part of sequence.
+                Defaults to "whole".
+            preprocess (str, optional): preprocessing of both sequences.
+                Defaults to None.
+            max_cost (float, optional): abandon the alignment if its
+                distance exceeds max_cost, the distance is ∞ and the
+                optimal warping path and warped query are None.
+                Defaults to None.
+            keep (Iterable[str], optional): attributes cached whenever
+                they are computed. Defaults to ("distance", "owp").
+
+        Raises:
+            ValueError: If an attribute in keep is undefined
+        """
+        self.keep = set(keep)
+        if not self.keep.issubset(ATTRIBUTES):
+            raise ValueError("Undefined result attribute")
+
+        self.dtwm = DTWMetrics()
+        self.reference = reference
+        self.query = query
+        self.options = {
+            "distance_metric": distance_metric,
+            "step_pattern": step_pattern,
+            "sequence": sequence,
+            "preprocess": preprocess,
+            "max_cost": max_cost,
+        }
+        self.cache = {}
+
+    @property
+    def cm(self) -> np.ndarray:
+        """Cost matrix."""
+        return self.fetch("cm", store=True)
+
+    @property
+    def acm(self) -> np.ndarray:
+        """Accumulated cost matrix."""
+        return self.fetch("acm", store=True)
+
+    @property
+    def owp(self) -> np.ndarray:
+        """Optimal warping path."""
+        return self.fetch("owp", store=True)
+
+    @property
+    def warped_query(self) -> np.ndarray:
+        """Warped query."""
+        return self.fetch("warped_query", store=True)
+
+    @property
+    def distance(self) -> float:
+        """DTW distance, i.e. D(N, M) or min Δ(b) for sub-sequences."""
+        return self.fetch("distance", store=True)
+
+    def fetch(self, name: str, store: bool = False):
+        """Return cached attribute or compute it.
+
+        Args:
+            name (str): attribute name
+            store (bool, optional): cache attribute even if not in keep.
+                Defaults to False.
+
+        Raises:
+            ValueError: If attribute can not be computed
+
+        Returns:
+            attribute value
+        """
+        if name in self.cache:
+            return self.cache[name]
+
+        if self.reference is None or self.query is None:
+            raise ValueError(f"Result {name} is not stored")
+
+        logging.debug("Compute result %s", name)
+        value = getattr(self, "compute_" + name)()
+
+        if store or name in self.keep:
+            self.cache[name] = value
+
+        return value
+
+    def compute_cm(self) -> np.ndarray:
+        """Compute cost matrix."""
+        preprocess = self.options["preprocess"]
+
+        return self.dtwm.cm(
+            self.dtwm.preprocess(self.reference, preprocess),
+            self.dtwm.preprocess(self.query, preprocess),
+            self.options["distance_metric"],
+        )
+
+    def compute_acm(self) -> np.ndarray:
+        """Compute accumulated cost matrix."""
+        step_pattern_str = str("step_" + self.options["step_pattern"])
+        step_pattern_func = getattr(self.dtwm, step_pattern_str)
+
+        return step_pattern_func(
+            self.fetch("cm"),
+            sequence=self.options["sequence"],
+            max_cost=self.options["max_cost"],
+        )
+
+    def is_abandoned(self, acm: np.ndarray) -> bool:
+        """Check if the alignment exceeds max_cost.
+
+        Args:
+            acm (np.ndarray): accumulated cost matrix
+
+        Returns:
+            bool: True if abandoned
+        """
+        distance = self.dtwm.acm_distance(
+            acm, self.options["sequence"], self.options["max_cost"]
+        )
+        return distance == np.inf
+
+    def compute_owp(self) -> Optional[np.ndarray]:
+        """Compute optimal warping path, None if abandoned."""
+        acm = self.fetch("acm")
+
+        # distance comes for free once acm is available
+        if "distance" in self.keep:
+            self.cache.setdefault(
+                "distance",
+                self.dtwm.acm_distance(
+                    acm, self.options["sequence"], self.options["max_cost"]
+                ),
+            )
+
+        if self.is_abandoned(acm):
+            return None
+
+        return self.dtwm.optimal_warping_path(acm)
+
+    def compute_distance(self) -> float:
+        """Compute DTW distance, ∞ if abandoned."""
+        return self.dtwm.acm_distance(
+            self.fetch("acm"),
+            self.options["sequence"],
+            self.options["max_cost"],
+        )
+
+    def compute_warped_query(self) -> Optional[np.ndarray]:
+        """Compute warped query, None if abandoned."""
+        owp = self.fetch("owp")
+
+        if owp is None:
+            return None
+
+        return self.dtwm.warped_sequence(self.query, owp)
+
+    def release(self, *names: str) -> None:
+        """Drop cached attributes, all if no names are given.
+
+        Args:
+            names (str): attribute names
+        """
+        for name in names or tuple(self.cache):
+            self.cache.pop(name, None)
+
+    def save(
+        self,
+        path: str,
+        matrices: Iterable[str] = (),
+        dtype: str = "float32",
+    ) -> None:
+        """Save result in compact npz encoding.
+
+        The distance and the run-length encoded path are always stored,
+        matrices only if requested and cast to dtype.
+
+        Args:
+            path (str): file path
+            matrices (Iterable[str], optional): matrices to store ("cm",
+                "acm"). Defaults to ().
+            dtype (str, optional): matrix dtype ("float16", "float32" or
+                "float64"). Defaults to "float32".
+
+        Raises:
+            ValueError: If matrix or dtype is undefined
+        """
+        logging.info("Save alignment result to %s", path)
+
+        if dtype not in ("float16", "float32", "float64"):
+            raise ValueError("Undefined matrix dtype")
+
+        data = {
+            "distance": np.float64(self.fetch("distance")),
+            "options": np.array(json.dumps(self.options)),
+        }
+
+        # abandoned alignments have no path
+        owp = self.fetch("owp")
+        if owp is not None:
+            start, moves, runs = self.encode_path(owp)
+            data.update(owp_start=start, owp_moves=moves, owp_runs=runs)
+
+        for name in matrices:
+            if name not in ("cm", "acm"):
+                raise ValueError(f"Undefined matrix {name}")
+            data[name] = self.fetch(name).astype(dtype)
+
+        np.savez_compressed(path, **data)
+
+    @staticmethod
+    def encode_path(
+        owp: np.ndarray,
+    ) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """Encode warping path as run-length encoded moves.
+
+        Each step between consecutive path entries is a move (Δ0, Δ1)
+        with Δ ∈ {0, 1, 2}, stored as code 3·Δ0 + Δ1. Runs of equal
+        moves are stored once with their length. Paths of
+        DTWMetrics.optimal_warping_path always qualify, including single sample
+        sequences and the trailing [M, N] entry.
+
+        Args:
+            owp (np.ndarray): warping path
+
+        Raises:
+            ValueError: If path is not monotone with steps of at most 2
+
+        Returns:
+            Tuple[np.ndarray, np.ndarray, np.ndarray]: start entry, move
+                codes (uint8) and run lengths (smallest unsigned dtype)
+        """
+        owp = np.asarray(owp, dtype=np.int64)
+        steps = np.diff(owp, axis=0)
+
+        if np.any((steps < 0) | (steps > 2)):
+            raise ValueError("Path steps must be in [0, 2]")
+
+        codes = (3 * steps[:, 0] + steps[:, 1]).astype(np.uint8)
+
+        # start of each run of equal codes
+        starts = np.flatnonzero(np.diff(codes.astype(np.int16), prepend=-1))
+        runs = np.diff(np.append(starts, len(codes)))
+
+        # smallest unsigned dtype holding the longest run
+        runs = runs.astype(np.min_scalar_type(runs.max(initial=0)))
+
+        return owp[0], codes[starts], runs
+
+    @staticmethod
+    def decode_path(
+        start: np.ndarray, moves: np.ndarray, runs: np.ndarray
+    ) -> np.ndarray:
+        """Decode run-length encoded warping path.
+
+        Args:
+            start (np.ndarray): start entry
+            moves (np.ndarray): move codes
+            runs (np.ndarray): run lengths
+
+        Returns:
+            np.ndarray: warping path
+        """
+        codes = np.repeat(np.asarray(moves, dtype=np.int64), runs)
+        steps = np.stack([codes // 3, codes % 3], axis=1)
+
+        owp = np.empty((len(codes) + 1, 2), dtype=np.int64)
+        owp[0] = start
+        np.cumsum(steps, axis=0, out=owp[1:])
+        owp[1:] += owp[0]
+
+        return owp
+
+    @classmethod
+    def load(cls, path: str) -> "DTWResult":
+        """Load result saved with save.
+
+        Args:
+            path (str): file path
+
+        Returns:
+            DTWResult: result with stored attributes
+        """
+        with np.load(path) as data:
+            result = cls(**json.loads(str(data["options"])))
+            result.cache["distance"] = float(data["distance"])
+            result.cache["owp"] = None
+            if "owp_start" in data.files:
+                result.cache["owp"] = cls.decode_path(
+                    data["owp_start"], data["owp_moves"], data["owp_runs"]
+                )
+            for name in ("cm", "acm"):
+                if name in data.files:
+                    result.cache[name] = data[name]
+
+        return result
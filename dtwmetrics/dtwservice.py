@@ -0,0 +1,265 @@
+"""Asyncio alignment service.
+
+(c) Daniel Vogler
+
+Alignment service:
+- awaitable distances computed on a bounded executor
+- backpressure on the number of pending requests
+- concurrent requests for the same reference coalesced into one
+  multi-query kernel call
+- per-request latency and queue depth metrics
+"""
+import asyncio
+import hashlib
+import logging
+import time
+from collections import deque
+from concurrent.futures import Executor, ProcessPoolExecutor
+from functools import partial
+from typing import Optional
+
+import numpy as np
+
+from dtwmetrics.dtwmetrics import DTWMetrics
+
+
+class DTWService:
+    """Asyncio facade of DTWMetrics.
+
+    Example:
+        async with DTWService() as aligner:
+            distance = await aligner.distance(reference, query)
+    """
+
+    def __init__(
+        self,
+        max_workers: int = 2,
+        max_pending: int = 256,
+        max_batch: int = 64,
+        coalesce_delay: float = 0.002,
+        executor: Optional[Executor] = None,
+        distance_metric: str = "euclidean",
+        step_pattern: str = "symmetric_p0",
+        sequence: str = "whole",
+        preprocess: Optional[str] = None,
+        max_cost: Optional[float] = None,
+    ):
+        """Init.
+
+        Args:
+            max_workers (int, optional): maximum number of batches
+                computed concurrently. Defaults to 2.
+            max_pending (int, optional): maximum number of admitted
+                requests, further requests wait. Defaults to 256.
+            max_batch (int, optional): maximum number of queries per
+                batch. Defaults to 64.
+            coalesce_delay (float, optional): seconds a new batch waits
+                for further queries of the same reference.
+                Defaults to 0.002.
+            executor (Executor, optional): executor running the kernels.
+                Defaults to a process pool with max_workers processes.
+            distance_metric (str, optional): distance metric.
+                Defaults to "euclidean".
+            step_pattern (str, optional): step pattern.
+                Defaults to "symmetric_p0".
+            sequence (str, optional): whole or part of sequence.
+                Defaults to "whole".
+            preprocess (str, optional): preprocessing of all sequences.
+                Defaults to None.
+            max_cost (float, optional): abandon alignments exceeding
+                this distance, their distance is ∞. Defaults to None.
+        """
+        self.options = {
+            "distance_metric": distance_metric,
+            "step_pattern": step_pattern,
+            "sequence": sequence,
+            "preprocess": preprocess,
+            "max_cost": max_cost,
+        }
+        self.limits = {
+            "max_batch": max_batch,
+            "coalesce_delay": coalesce_delay,
+            "admission": asyncio.Semaphore(max_pending),
+            "workers": asyncio.Semaphore(max_workers),
+        }
+
+        self.own_executor = executor is None
+        self.executor = executor or ProcessPoolExecutor(max_workers)
+
+        # open batches per reference key
+        self.batches = {}
+        self.tasks = set()
+
+        # metrics, waiting requests are not yet admitted
+        self.counters = {
+            "waiting": 0,
+            "admitted": 0,
+            "requests": 0,
+            "batches": 0,
+            "latencies": deque(maxlen=1000),
+        }
+
+    async def __aenter__(self) -> "DTWService":
+        """Enter context."""
+        return self
+
+    async def __aexit__(self, *exc) -> None:
+        """Exit context."""
+        await self.close()
+
+    async def close(self) -> None:
+        """Wait for running batches and shut down owned executor."""
+        for batch in list(self.batches.values()):
+            batch["timer"].cancel()
+        for key in list(self.batches):
+            self.dispatch(key)
+
+        if self.tasks:
+            await asyncio.gather(*self.tasks)
+
+        if self.own_executor:
+            self.executor.shutdown()
+
+    def reference_key(self, reference: np.ndarray) -> tuple:
+        """Identify reference by content.
+
+        Args:
+            reference (np.ndarray): reference sequence
+
+        Returns:
+            tuple: shape, dtype and digest of the reference
+        """
+        reference = np.ascontiguousarray(reference)
+        digest = hashlib.blake2b(reference.tobytes(), digest_size=16)
+
+        return reference.shape, reference.dtype.str, digest.digest()
+
+    async def distance(self, reference: np.ndarray, query: np.ndarray):
+        """Compute DTW distance without blocking the event loop.
+
+        Args:
+            reference (np.ndarray): reference sequence
+            query (np.ndarray): query sequence
+
+        Returns:
+            float: distance D(N, M)
+        """
+        start = time.perf_counter()
+        counters = self.counters
+
+        counters["waiting"] += 1
+        try:
+            await self.limits["admission"].acquire()
+        finally:
+            counters["waiting"] -= 1
+
+        counters["admitted"] += 1
+        try:
+            loop = asyncio.get_running_loop()
+            future = loop.create_future()
+            key = self.reference_key(reference)
+
+            batch = self.batches.get(key)
+            if batch is None:
+                batch = {
+                    "reference": reference,
+                    "items": [],
+                    "timer": loop.call_later(
+                        self.limits["coalesce_delay"], self.dispatch, key
+                    ),
+                }
+                self.batches[key] = batch
+            batch["items"].append((query, future))
+
+            if len(batch["items"]) >= self.limits["max_batch"]:
+                batch["timer"].cancel()
+                self.dispatch(key)
+
+            return await future
+
+        finally:
+            self.limits["admission"].release()
+            counters["admitted"] -= 1
+            counters["requests"] += 1
+            counters["latencies"].append(time.perf_counter() - start)
+
+    def dispatch(self, key: tuple) -> None:
+        """Close batch and schedule its computation.
+
+        Args:
+            key (tuple): reference key
+        """
+        batch = self.batches.pop(key, None)
+        if batch is None:
+            return
+
+        task = asyncio.create_task(
+            self.run_batch(batch["reference"], batch["items"])
+        )
+        self.tasks.add(task)
+        task.add_done_callback(self.tasks.discard)
+
+    async def run_batch(self, reference: np.ndarray, items: list) -> None:
+        """Compute batch on the executor and resolve its requests.
+
+        Args:
+            reference (np.ndarray): reference sequence
+            items (list): queries and futures of the requests
+        """
+        queries = [query for query, _ in items]
+        kernel = partial(
+            DTWMetrics().distances, reference, queries, **self.options
+        )
+
+        async with self.limits["workers"]:
+            self.counters["batches"] += 1
+            logging.debug("Run batch of %d queries", len(queries))
+            try:
+                distances = await asyncio.get_running_loop().run_in_executor(
+                    self.executor, kernel
+                )
+            except Exception as err:  # pylint: disable=broad-except
+                if len(items) == 1:
+                    if not items[0][1].done():
+                        items[0][1].set_exception(err)
+                    return
+                distances = None
+
+        # a failing query must not fail the other requests of the batch
+        if distances is None:
+            await asyncio.gather(
+                *(self.run_batch(reference, [item]) for item in items)
+            )
+            return
+
+        for (_, future), distance in zip(items, distances):
+            if not future.done():
+                future.set_result(float(distance))
+
+    def metrics(self) -> dict:
+        """Return request metrics.
+
+        Returns:
+            dict: queue depth (waiting and admitted requests), request
+                and batch counts and latency percentiles (seconds) of
+                the last 1000 requests
+        """
+        counters = self.counters
+        latencies = np.asarray(counters["latencies"])
+        has_latencies = len(latencies) > 0
+
+        return {
+            "queue_depth": counters["waiting"] + counters["admitted"],
+            "waiting": counters["waiting"],
+            "admitted": counters["admitted"],
+            "open_batches": len(self.batches),
+            "running_batches": len(self.tasks),
+            "requests": counters["requests"],
+            "batches": counters["batches"],
+            "latency_p50": (
+                float(np.percentile(latencies, 50)) if has_latencies else None
+            ),
+            "latency_p95": (
+                float(np.percentile(latencies, 95)) if has_latencies else None
+            ),
+        }
@@ -0,0 +1,253 @@
+"""Soft-DTW, a differentiable loss based on dynamic time warping.
+
+(c) Daniel Vogler
+
+Soft-DTW:
+- soft minimum recurrence, one anti-diagonal per array operation
+- gradient w.r.t. the cost matrix (expected alignment)
+- batched evaluation of pairs sharing a cost matrix shape
+
+References:
+(1) Cuturi, Marco, and Mathieu Blondel. Soft-DTW: a differentiable loss
+    function for time-series. Proceedings of the 34th International
+    Conference on Machine Learning, 2017. https://arxiv.org/abs/1703.01541
+"""
+import logging
+from typing import List, Tuple
+
+import numpy as np
+
+from dtwmetrics.dtwmetrics import DTWMetrics
+
+
+class DTWSoft:
+    """Soft-DTW value and gradient of sequences or cost matrices."""
+
+    def __init__(self):
+        """Init."""
+        self.dtwm = DTWMetrics()
+
+    def softmin(
+        self, a: np.ndarray, b: np.ndarray, c: np.ndarray, gamma: float
+    ) -> np.ndarray:
+        """Compute elementwise soft minimum of three arrays.
+
+        min^γ{a, b, c} = -γ log(exp(-a/γ) + exp(-b/γ) + exp(-c/γ))
+
+        Args:
+            a (np.ndarray): array 1
+            b (np.ndarray): array 2
+            c (np.ndarray): array 3
+            gamma (float): smoothing parameter
+
+        Returns:
+            np.ndarray: soft minimum
+        """
+        stack = np.stack([a, b, c])
+        rmin = stack.min(axis=0)
+
+        # cells without any finite predecessor stay infinite
+        finite = np.isfinite(rmin)
+        shift = np.where(finite, rmin, 0.0)
+
+        with np.errstate(invalid="ignore", over="ignore"):
+            z = np.exp(-(stack - shift) / gamma).sum(axis=0)
+
+        return np.where(finite, shift - gamma * np.log(z), np.inf)
+
+    def soft_acm(self, cm: np.ndarray, gamma: float = 1.0) -> np.ndarray:
+        """Compute Soft-DTW accumulated cost matrix.
+
+        From (1):
+        R(n, m) = c(x_n, y_m) + min^γ{R(n − 1, m − 1), R(n − 1, m),
+            R(n, m − 1)}
+        with R(0, 0) := 0 and R(n, 0) = R(0, m) := ∞.
+
+        The recurrence is evaluated one anti-diagonal at a time, each
+        diagonal (and every matrix of a batch) as one array operation.
+
+        Args:
+            cm (np.ndarray): cost matrix (N, M) or batch of cost
+                matrices (B, N, M)
+            gamma (float, optional): smoothing parameter.
+                Defaults to 1.0.
+
+        Raises:
+            ValueError: If gamma is not positive
+
+        Returns:
+            np.ndarray: accumulated soft cost matrix, same shape as cm
+        """
+        logging.info("Compute Soft-DTW accumulated cost matrix")
+
+        if gamma <= 0:
+            raise ValueError("Smoothing parameter gamma must be positive")
+
+        cm = np.asarray(cm, dtype=np.double)
+        batch = cm.ndim == 3
+        cm = cm if batch else cm[np.newaxis]
+
+        B, N, M = cm.shape
+
+        # padded matrix holds the boundary conditions
+        R = np.full((B, N + 1, M + 1), np.inf)
+        R[:, 0, 0] = 0.0
+
+        # anti-diagonals d = n + m in 1-based padded indices
+        for d in range(2, N + M + 1):
+            n = np.arange(max(1, d - M), min(N, d - 1) + 1)
+            m = d - n
+            R[:, n, m] = cm[:, n - 1, m - 1] + self.softmin(
+                R[:, n - 1, m - 1], R[:, n - 1, m], R[:, n, m - 1], gamma
+            )
+
+        R = R[:, 1:, 1:]
+
+        return R if batch else R[0]
+
+    def soft_dtw_grad(
+        self, cm: np.ndarray, gamma: float = 1.0
+    ) -> Tuple[np.ndarray, np.ndarray]:
+        """Compute Soft-DTW value and gradient w.r.t. the cost matrix.
+
+        The gradient E = ∂R(N, M)/∂C is the expected alignment matrix
+        and is obtained in one reverse sweep over the anti-diagonals (1,
+        Algorithm 2). Chain it with the derivative of the distance
+        metric to obtain gradients w.r.t. the sequences.
+
+        Args:
+            cm (np.ndarray): cost matrix (N, M) or batch (B, N, M)
+            gamma (float, optional): smoothing parameter.
+                Defaults to 1.0.
+
+        Returns:
+            Tuple[np.ndarray, np.ndarray]: Soft-DTW value(s) and gradient
+                with the same shape as cm
+        """
+        logging.info("Compute Soft-DTW gradient")
+
+        cm = np.asarray(cm, dtype=np.double)
+        batch = cm.ndim == 3
+        cm = cm if batch else cm[np.newaxis]
+        R = self.soft_acm(cm, gamma=gamma)
+
+        B, N, M = cm.shape
+
+        # padded copies for the reverse recursion
+        D = np.zeros((B, N + 2, M + 2))
+        D[:, 1 : N + 1, 1 : M + 1] = cm
+        R_pad = np.full((B, N + 2, M + 2), -np.inf)
+        R_pad[:, 1 : N + 1, 1 : M + 1] = R
+        R_pad[:, N + 1, M + 1] = R[:, -1, -1]
+
+        E = np.zeros((B, N + 2, M + 2))
+        E[:, N + 1, M + 1] = 1.0
+
+        for d in range(N + M, 1, -1):
+            n = np.arange(max(1, d - M), min(N, d - 1) + 1)
+            m = d - n
+            r = R_pad[:, n, m]
+            a = np.exp((R_pad[:, n + 1, m] - r - D[:, n + 1, m]) / gamma)
+            b = np.exp((R_pad[:, n, m + 1] - r - D[:, n, m + 1]) / gamma)
+            c = np.exp(
+                (R_pad[:, n + 1, m + 1] - r - D[:, n + 1, m + 1]) / gamma
+            )
+            E[:, n, m] = (
+                E[:, n + 1, m] * a
+                + E[:, n, m + 1] * b
+                + E[:, n + 1, m + 1] * c
+            )
+
+        value = R[:, -1, -1]
+        E = E[:, 1 : N + 1, 1 : M + 1]
+
+        if batch:
+            return value, E
+
+        return value[0], E[0]
+
+    def soft_dtw(
+        self,
+        reference: np.ndarray,
+        query: np.ndarray,
+        gamma: float = 1.0,
+        distance_metric: str = "sqeuclidean",
+    ) -> float:
+        """Compute Soft-DTW value of two sequences.
+
+        Args:
+            reference (np.ndarray): sequence 1
+            query (np.ndarray): sequence 2
+            gamma (float, optional): smoothing parameter.
+                Defaults to 1.0.
+            distance_metric (str, optional): distance metric.
+                Defaults to "sqeuclidean".
+
+        Returns:
+            float: Soft-DTW value
+        """
+        cm = self.dtwm.cm(reference, query, distance_metric)
+
+        return self.soft_acm(cm, gamma=gamma)[-1, -1]
+
+    def soft_dtw_batch(
+        self,
+        references: List[np.ndarray],
+        queries: List[np.ndarray],
+        gamma: float = 1.0,
+        distance_metric: str = "sqeuclidean",
+        gradient: bool = False,
+    ):
+        """Compute Soft-DTW for many pairs of sequences.
+
+        Pairs sharing the same cost matrix shape are evaluated in a
+        single batched sweep.
+
+        Args:
+            references (List[np.ndarray]): sequences 1
+            queries (List[np.ndarray]): sequences 2
+            gamma (float, optional): smoothing parameter.
+                Defaults to 1.0.
+            distance_metric (str, optional): distance metric.
+                Defaults to "sqeuclidean".
+            gradient (bool, optional): also return the gradients w.r.t.
+                the cost matrices. Defaults to False.
+
+        Raises:
+            ValueError: If number of references and queries differ
+
+        Returns:
+            np.ndarray: Soft-DTW values, plus list of gradients if
+                requested
+        """
+        logging.info("Compute batched Soft-DTW")
+
+        if len(references) != len(queries):
+            raise ValueError("Number of references and queries differ")
+
+        cms = [
+            self.dtwm.cm(x, y, distance_metric)
+            for x, y in zip(references, queries)
+        ]
+
+        # group pairs by cost matrix shape
+        groups = {}
+        for k, cm in enumerate(cms):
+            groups.setdefault(cm.shape, []).append(k)
+
+        values = np.empty(len(cms))
+        grads = [None] * len(cms)
+
+        for idx in groups.values():
+            stack = np.stack([cms[k] for k in idx])
+            if gradient:
+                values[idx], E = self.soft_dtw_grad(stack, gamma=gamma)
+                for k, e in zip(idx, E):
+                    grads[k] = e
+            else:
+                values[idx] = self.soft_acm(stack, gamma=gamma)[:, -1, -1]
+
+        if gradient:
+            return values, grads
+
+        return values
@@ -4,8 +4,10 @@
 
 Utilities:
 - plotting
+- downsampling of large matrices, paths and sequences for plotting
 """
 import logging
+from typing import Optional, Tuple
 
 import numpy as np
 from matplotlib import pyplot as plt
@@ -18,6 +20,114 @@ dtwm = DTWMetrics()
 class DTWUtils:
     """Util class for dynamic time warping."""
 
+    def decimation_step(self, length: int, max_points: int) -> int:
+        """Compute stride to plot at most max_points of length samples.
+
+        Args:
+            length (int): number of samples
+            max_points (int): maximum number of plotted samples
+
+        Returns:
+            int: stride
+        """
+        return max(1, -(-length // max_points))
+
+    def pool_matrix(
+        self,
+        matrix: np.ndarray,
+        max_size: int = 1000,
+        pooling: str = "min",
+        window: Optional[Tuple[int, int, int, int]] = None,
+    ) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """Reduce matrix to at most max_size cells per side.
+
+        Blocks of cells are reduced to their minimum (keeps low cost
+        valleys such as the warping path visible) or mean, without
+        padding copies of the matrix.
+
+        Args:
+            matrix (np.ndarray): matrix (reference x query)
+            max_size (int, optional): maximum cells per side.
+                Defaults to 1000.
+            pooling (str, optional): "min" or "mean". Defaults to "min".
+            window (Tuple[int, int, int, int], optional): zoom window
+                (row start, row end, column start, column end).
+                Defaults to None (whole matrix).
+
+        Raises:
+            ValueError: If pooling method is undefined
+
+        Returns:
+            Tuple[np.ndarray, np.ndarray, np.ndarray]: reduced matrix,
+                row edges and column edges in matrix indices
+        """
+        if window is not None:
+            n0, n1, m0, m1 = window
+            matrix = matrix[n0:n1, m0:m1]
+        else:
+            n0 = m0 = 0
+
+        N, M = matrix.shape
+        step_n = self.decimation_step(N, max_size)
+        step_m = self.decimation_step(M, max_size)
+        rows = np.arange(0, N, step_n)
+        cols = np.arange(0, M, step_m)
+
+        logging.debug("Pool matrix by (%d, %d)", step_n, step_m)
+
+        if pooling == "min":
+            reduced = np.minimum.reduceat(matrix, rows, axis=0)
+            reduced = np.minimum.reduceat(reduced, cols, axis=1)
+        elif pooling == "mean":
+            reduced = np.add.reduceat(matrix, rows, axis=0, dtype=np.double)
+            reduced = np.add.reduceat(reduced, cols, axis=1)
+            reduced /= np.outer(
+                np.diff(np.append(rows, N)), np.diff(np.append(cols, M))
+            )
+        else:
+            raise ValueError("Undefined pooling method")
+
+        row_edges = n0 + np.append(rows, N)
+        col_edges = m0 + np.append(cols, M)
+
+        return reduced, row_edges, col_edges
+
+    def decimate_path(
+        self,
+        owp: np.ndarray,
+        max_points: int = 1000,
+        window: Optional[Tuple[int, int, int, int]] = None,
+    ) -> np.ndarray:
+        """Decimate warping path for plotting.
+
+        Args:
+            owp (np.ndarray): optimal warping path (query, reference)
+            max_points (int, optional): maximum number of points.
+                Defaults to 1000.
+            window (Tuple[int, int, int, int], optional): zoom window
+                as in pool_matrix. Defaults to None.
+
+        Returns:
+            np.ndarray: decimated path, end points are kept
+        """
+        if window is not None:
+            n0, n1, m0, m1 = window
+            inside = (
+                (owp[:, 1] >= n0)
+                & (owp[:, 1] <= n1)
+                & (owp[:, 0] >= m0)
+                & (owp[:, 0] <= m1)
+            )
+            owp = owp[inside]
+
+        if len(owp) <= max_points:
+            return owp
+
+        step = self.decimation_step(len(owp), max_points)
+        index = np.append(np.arange(0, len(owp) - 1, step), len(owp) - 1)
+
+        return owp[index]
+
     def plot_sequences(self, reference: np.ndarray, query: np.ndarray) -> None:
         """Plot two sequences.
 
@@ -67,7 +177,11 @@ class DTWUtils:
         plt.title("Time sequence")
 
     def plot_warped_sequences(
-        self, reference: np.ndarray, query: np.ndarray, owp: np.ndarray
+        self,
+        reference: np.ndarray,
+        query: np.ndarray,
+        owp: np.ndarray,
+        max_points: int = 5000,
     ) -> None:
         """Plot warped sequences.
 
@@ -76,10 +190,23 @@ class DTWUtils:
             query (np.ndarray): sequence 2
             owp (np.ndarray): optimal warping path to overlay
                 sequence 1 on sequence 2
+            max_points (int, optional): maximum number of plotted points
+                per sequence. Defaults to 5000.
         """
         reference = dtwm.dim_check(reference)
         query = dtwm.dim_check(query)
 
+        # decimate large inputs, path before warping the query
+        warped_query = dtwm.warped_sequence(
+            query, self.decimate_path(owp, max_points)
+        )
+        step = self.decimation_step(len(reference), max_points)
+        reference = reference[::step]
+        reference_index = np.arange(0, len(reference) * step, step)
+        step = self.decimation_step(len(query), max_points)
+        query = query[::step]
+        query_index = np.arange(0, len(query) * step, step)
+
         plt.figure(
             num=None, figsize=(16, 8), dpi=80, facecolor="w", edgecolor="k"
         )
@@ -89,6 +216,7 @@ class DTWUtils:
         # reference dim check
         if min(reference.shape) == 1:
             plt.plot(
+                reference_index,
                 reference,
                 marker=".",
                 c="k",
@@ -106,14 +234,20 @@ class DTWUtils:
 
         # query dim check
         if min(query.shape) == 1:
-            plt.plot(query, marker=".", c="r", label="Query", linestyle="None")
+            plt.plot(
+                query_index,
+                query,
+                marker=".",
+                c="r",
+                label="Query",
+                linestyle="None",
+            )
         else:
             plt.scatter(
                 query[:, 0], query[:, 1], marker=".", c="r", label="Query"
             )
 
         # warped sequence
-        warped_query = dtwm.warped_sequence(query, owp)
         if min(warped_query.shape) == 1:
             plt.plot(
                 warped_query,
@@ -124,8 +258,9 @@ class DTWUtils:
             )
         else:
             plt.scatter(
-                warped_query[:, 0],
-                warped_query[:, 1],
+                warped_query[:, 0].astype(np.double),
+                # samples of the query are stored as arrays per entry
+                np.vstack(warped_query[:, 1])[:, 0],
                 marker=".",
                 c="b",
                 label="Warped query",
@@ -144,9 +279,15 @@ class DTWUtils:
         owp=None,
         plot_dim: int = 1,
         title: str = "Matrix",
+        max_size: int = 1000,
+        pooling: str = "min",
+        window: Optional[Tuple[int, int, int, int]] = None,
     ) -> None:
         """Plot different matrices.
 
+        Large matrices are pooled to at most max_size cells per side
+        before plotting; the warping path is decimated accordingly.
+
         Args:
             reference (np.ndarray): sequence 1
             query (np.ndarray): sequence 2
@@ -156,10 +297,20 @@ class DTWUtils:
                 Defaults to "euclidean".
             plot_dim (int, optional): dimension. Defaults to 1.
             title (str, optional): plot title. Defaults to "Matrix".
+            max_size (int, optional): maximum plotted cells per side.
+                Defaults to 1000.
+            pooling (str, optional): "min" or "mean" pooling.
+                Defaults to "min".
+            window (Tuple[int, int, int, int], optional): zoom window
+                (reference start, reference end, query start, query end).
+                Defaults to None (whole matrix).
         """
         reference = dtwm.dim_check(reference)
         query = dtwm.dim_check(query)
 
+        N, M = matrix.shape
+        n0, n1, m0, m1 = window if window is not None else (0, N, 0, M)
+
         # Set up the axes with gridspec
         fig = plt.figure(figsize=(6, 6))
         font = {"size": 14}
@@ -170,54 +321,72 @@ class DTWUtils:
         x_plot = fig.add_subplot(grid[-1, 1:], sharex=main_ax)
 
         main_ax.set_title(title)
-        # plot passed matrix
+
+        # plot passed matrix, pooled in matrix coordinates
+        reduced, row_edges, col_edges = self.pool_matrix(
+            matrix, max_size=max_size, pooling=pooling, window=window
+        )
+        main_ax.pcolormesh(col_edges, row_edges, reduced)
 
         # plot owp if given
-        if "owp" in locals():
+        if owp is not None:
             try:
+                owp = self.decimate_path(owp, max_size, window=window)
                 main_ax.plot(owp[:, 0], owp[:, 1], color="w")
-            except ValueError:
+            except (ValueError, IndexError):
                 logging.debug("OPW plotting not possible")
 
-        main_ax.pcolormesh(matrix)
+        main_ax.set_xlim([m0, m1])
+        main_ax.set_ylim([n0, n1])
         main_ax.yaxis.tick_right()
         main_ax.xaxis.tick_top()
 
         # plots on the attached axes
+        step = self.decimation_step(m1 - m0, max_size)
+        query_index = np.arange(m0, min(m1, len(query)), step)
         x_plot.plot(
-            np.linspace(0, len(query[:, plot_dim]), len(query[:, plot_dim])),
-            query[:, plot_dim],
+            query_index,
+            query[query_index, plot_dim],
             color="gray",
         )
         x_plot.invert_yaxis()
         x_plot.set_ylim([-1.5, 1.5])
         x_plot.set_xlabel("Query [-]")
         # y-axis
+        step = self.decimation_step(n1 - n0, max_size)
+        reference_index = np.arange(n0, min(n1, len(reference)), step)
         y_plot.plot(
-            reference[:, plot_dim],
-            np.linspace(
-                0, len(reference[:, plot_dim]), len(reference[:, plot_dim])
-            ),
+            reference[reference_index, plot_dim],
+            reference_index,
             color="gray",
         )
         y_plot.invert_xaxis()
         y_plot.set_xlim([1.5, -1.5])
         y_plot.set_ylabel("Reference [-]")
 
-    def plot_delta_b(self, acm: np.ndarray) -> None:
+    def plot_delta_b(self, acm: np.ndarray, max_points: int = 5000) -> None:
         """Plot different deltas for subqueries.
 
+        Long rows are min-pooled so local minima remain visible.
+
         Args:
             acm (np.ndarray): accumulated cost matrix
+            max_points (int, optional): maximum number of plotted points.
+                Defaults to 5000.
         """
-        b, delta_b = dtwm.compute_similar_subsequences(acm)
+        # Δ(b) = D(N, b), see DTWMetrics.compute_similar_subsequences
+        delta_b = acm[-1, :]
+        step = self.decimation_step(len(delta_b), max_points)
+        index = np.arange(0, len(delta_b), step)
+        delta_b = np.minimum.reduceat(delta_b, index)
+
         plt.figure(
             num=None, figsize=(16, 8), dpi=80, facecolor="w", edgecolor="k"
         )
         font = {"size": 14}
         plt.rc("font", **font)
 
-        plt.plot(delta_b, marker=".", c="r", label="delta_b")
+        plt.plot(index, delta_b, marker=".", c="r", label="delta_b")
         plt.legend(loc="upper center")
         plt.xlabel("Time [-]")
         plt.ylabel("Value [-]")
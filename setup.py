@@ -14,4 +14,8 @@ setup(
     license="MIT",
     packages=["dtwmetrics"],
     install_requires=["scipy>=1.5.4"],
+    extras_require={"parquet": ["pyarrow"]},
+    entry_points={
+        "console_scripts": ["dtwmetrics=dtwmetrics.dtwcli:main"],
+    },
 )
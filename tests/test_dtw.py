@@ -91,3 +91,113 @@ class TestGeopard(unittest.TestCase):
         logging.info("DTW2: %f", dtw2[-1, -1])
 
         assert dtw2[-1, -1] == pytest.approx(0.933, 0.01)
+
+    def test_preprocess_function(self):
+        """Preprocessing test."""
+        dtwm = DTWMetrics()
+
+        x = np.linspace(0, 12, 100)
+        y_1 = np.cos(x)
+        # scaled and offset copy
+        y_2 = 3.0 * np.cos(x) + 5.0
+
+        dtw = dtwm.acm(y_1, y_2, preprocess="znorm")
+        assert dtw[-1, -1] == pytest.approx(0.0, abs=1e-9)
+
+        # offset vanishes in derivative
+        dtw = dtwm.acm(y_1, y_1 + 5.0, preprocess="derivative")
+        assert dtw[-1, -1] == pytest.approx(0.0, abs=1e-9)
+
+        # running statistics match per-window statistics
+        mean, std = dtwm.rolling_stats(y_2, 10)
+        assert mean.shape == (91, 1)
+        assert mean[20, 0] == pytest.approx(np.mean(y_2[20:30]))
+        assert std[20, 0] == pytest.approx(np.std(y_2[20:30]))
+
+        with pytest.raises(ValueError):
+            dtwm.acm(y_1, y_2, preprocess="undefined")
+
+    def test_pruned_function(self):
+        """Pruned symmetric p0 test."""
+        dtwm = DTWMetrics()
+
+        for length_2 in (120, 150):
+            y_1 = np.cos(np.linspace(0, 12, 120))
+            y_2 = np.cos(np.linspace(0.2, 12.2, length_2))
+
+            acm = dtwm.acm(y_1, y_2)
+            acm_pruned = dtwm.acm(y_1, y_2, step_pattern="symmetric_p0_pruned")
+
+            assert acm_pruned[-1, -1] == acm[-1, -1]
+            assert np.array_equal(
+                dtwm.optimal_warping_path(acm_pruned),
+                dtwm.optimal_warping_path(acm),
+            )
+            assert dtwm.pruning_stats["pruned"] > 0
+            assert dtwm.pruning_stats["computed"] < 120 * length_2
+
+        # random cost matrices, pruned cells must never hide the optimum
+        rng = np.random.default_rng(0)
+        for _ in range(2000):
+            N, M = rng.integers(1, 8, size=2)
+            cm = rng.uniform(0, 10, size=(N, M))
+            acm = dtwm.step_symmetric_p0(cm)
+            acm_pruned = dtwm.step_symmetric_p0_pruned(cm)
+            assert acm_pruned[-1, -1] == acm[-1, -1]
+
+    def test_early_abandon_function(self):
+        """Early abandoning test."""
+        dtwm = DTWMetrics()
+
+        y_1 = np.cos(np.linspace(0, 12, 100))
+        y_2 = np.cos(np.linspace(0, 12, 90)) + 0.5
+
+        for step_pattern in (
+            "symmetric_p0",
+            "symmetric_p0_pruned",
+            "symmetric_p1",
+        ):
+            distance = dtwm.acm(y_1, y_2, step_pattern=step_pattern)[-1, -1]
+
+            # cutoff above distance gives exact result
+            acm = dtwm.acm(
+                y_1, y_2, step_pattern=step_pattern, max_cost=distance + 1
+            )
+            assert acm[-1, -1] == pytest.approx(distance)
+
+            # cutoff below distance abandons
+            acm = dtwm.acm(
+                y_1, y_2, step_pattern=step_pattern, max_cost=distance / 2
+            )
+            assert acm[-1, -1] == np.inf
+            assert np.all(np.isinf(acm[-1]))
+
+        cm, acm, owp, warped_query = dtwm.dtwm(y_1, y_2, max_cost=1.0)
+        assert acm[-1, -1] == np.inf
+        assert owp is None and warped_query is None
+
+        distances = dtwm.distances(y_1, [y_1, y_2], max_cost=1.0)
+        assert distances[0] == pytest.approx(0.0)
+        assert distances[1] == np.inf
+
+        # sub-sequences keep Δ(b) of the computed last row
+        x = np.array([0.0, 1.0, 2.0, 1.0, 0.0])
+        y = np.array([5.0, 5.0, 0.0, 1.0, 2.0, 1.0, 0.0, 5.0, 5.0])
+        acm_sub = dtwm.acm(x, y, sequence="sub")
+        cm, acm, owp, warped_query = dtwm.dtwm(
+            x, y, sequence="sub", max_cost=1.0
+        )
+        assert np.array_equal(acm, acm_sub)
+        assert owp is not None
+
+        cm, acm, owp, warped_query = dtwm.dtwm(
+            x, y + 10.0, sequence="sub", max_cost=1.0
+        )
+        assert owp is None
+
+        # sub-sequence distance is min Δ(b), not Δ(M)
+        distances = dtwm.distances(
+            x, [y, y + 10.0], sequence="sub", max_cost=1.0
+        )
+        assert distances[0] == acm_sub[-1].min() < acm_sub[-1, -1]
+        assert distances[1] == np.inf
@@ -0,0 +1,54 @@
+"""Provide unit test cases for ragged batch alignment."""
+import logging
+import unittest
+
+import numpy as np
+import pytest
+
+from dtwmetrics.dtwbatch import DTWBatch
+from dtwmetrics.dtwmetrics import DTWMetrics
+
+logging.basicConfig(encoding="utf-8", level=logging.INFO)
+
+
+class TestDTWBatch(unittest.TestCase):
+    """Test ragged batch alignment."""
+
+    def test_batch_function(self):
+        """Ragged batch test."""
+        dtwm = DTWMetrics()
+        dtwb = DTWBatch()
+        rng = np.random.default_rng(0)
+
+        references = [
+            np.cos(np.linspace(0, 6, n)) for n in rng.integers(20, 40, 12)
+        ]
+        queries = [
+            np.cos(np.linspace(0.3, 6.3, m)) + 0.05 * rng.standard_normal(m)
+            for m in rng.integers(20, 40, 12)
+        ]
+
+        buffer, offsets = dtwb.pack(queries)
+        assert buffer.shape == (sum(len(y) for y in queries), 1)
+        assert np.array_equal(buffer[offsets[3] : offsets[4], 0], queries[3])
+
+        for step_pattern in ("symmetric_p0", "symmetric_p1"):
+            distances, owps, path_offsets = dtwb.batch(
+                references,
+                queries,
+                step_pattern=step_pattern,
+                paths=True,
+                max_cells=3000,
+            )
+            for k, (x, y) in enumerate(zip(references, queries)):
+                acm = dtwm.acm(x, y, step_pattern=step_pattern)
+                assert distances[k] == pytest.approx(acm[-1, -1])
+                assert np.array_equal(
+                    owps[path_offsets[k] : path_offsets[k + 1]],
+                    dtwm.optimal_warping_path(acm),
+                )
+
+        distances = dtwb.batch(references, queries, sequence="sub")
+        for k, (x, y) in enumerate(zip(references, queries)):
+            acm = dtwm.acm(x, y, sequence="sub")
+            assert distances[k] == pytest.approx(acm[-1, -1])
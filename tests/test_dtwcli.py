@@ -0,0 +1,106 @@
+"""Provide unit test cases for the command line batch runner."""
+import json
+import logging
+import os
+import shutil
+import tempfile
+import unittest
+
+import numpy as np
+import pytest
+
+from dtwmetrics.dtwcli import main
+from dtwmetrics.dtwmetrics import DTWMetrics
+
+logging.basicConfig(encoding="utf-8", level=logging.INFO)
+
+
+class TestDTWCli(unittest.TestCase):
+    """Test command line batch runner."""
+
+    def setUp(self):
+        """Write sequence files."""
+        tmp = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, tmp)
+        self.data = os.path.join(tmp, "data")
+        os.mkdir(self.data)
+
+        x = np.linspace(0, 6, 30)
+        self.sequences = [np.cos(x + shift) for shift in (0.0, 0.2, 0.4)]
+        for k, y in enumerate(self.sequences):
+            np.save(os.path.join(self.data, f"s{k}.npy"), y)
+        np.savetxt(os.path.join(self.data, "s3.csv"), np.sin(x), delimiter=",")
+        self.output = os.path.join(tmp, "out.jsonl")
+
+    def read_output(self):
+        """Read results."""
+        with open(self.output, encoding="utf-8") as f:
+            return [json.loads(line) for line in f]
+
+    def test_pairwise(self):
+        """Pairwise alignment in parallel."""
+        main(
+            [
+                self.data,
+                "--output",
+                self.output,
+                "--jobs",
+                "2",
+                "--cache-size",
+                "1",
+            ]
+        )
+
+        results = sorted(self.read_output(), key=lambda r: r["index"])
+        assert len(results) == 6
+
+        dtwm = DTWMetrics()
+        distance = dtwm.acm(self.sequences[0], self.sequences[1])[-1, -1]
+        assert results[0]["reference"] == "s0.npy"
+        assert results[0]["query"] == "s1.npy"
+        assert results[0]["distance"] == pytest.approx(distance)
+
+    def test_resume(self):
+        """Interrupted run is resumed."""
+        reference = os.path.join(self.data, "s0.npy")
+        main([self.data, "--reference", reference, "--output", self.output])
+        complete = self.read_output()
+
+        # keep first result and a partially written line
+        with open(self.output, "r+", encoding="utf-8") as f:
+            first = f.readline()
+            f.seek(len(first))
+            f.write('{"index": 1, "dist')
+            f.truncate()
+
+        main(
+            [
+                self.data,
+                "--reference",
+                reference,
+                "--output",
+                self.output,
+                "--paths",
+            ]
+        )
+        resumed = self.read_output()
+
+        # reference inside the input directory is not a query
+        assert len(resumed) == len(complete) == 3
+        assert all(r["query"] != "s0.npy" for r in resumed)
+        assert resumed[0] == complete[0]
+        assert "path" in resumed[1]
+        assert sorted(r["index"] for r in resumed) == [0, 1, 2]
+
+    def test_resume_added_input(self):
+        """Resume skips pairs by name after inputs were added."""
+        reference = os.path.join(self.data, "s0.npy")
+        args = [self.data, "--reference", reference, "--output", self.output]
+        main(args)
+
+        # sorts first and shifts the index of every other pair
+        np.save(os.path.join(self.data, "a.npy"), self.sequences[1])
+        main(args)
+
+        queries = sorted(r["query"] for r in self.read_output())
+        assert queries == ["a.npy", "s1.npy", "s2.npy", "s3.csv"]
@@ -0,0 +1,53 @@
+"""Provide unit test cases for DTW barycenter averaging."""
+import logging
+import unittest
+from math import pi
+
+import numpy as np
+
+from dtwmetrics.dtwdba import DTWBarycenter
+from dtwmetrics.dtwmetrics import DTWMetrics
+
+logging.basicConfig(encoding="utf-8", level=logging.INFO)
+
+
+class TestDTWBarycenter(unittest.TestCase):
+    """Test DTW barycenter averaging."""
+
+    def test_dba_function(self):
+        """DTW barycenter averaging test."""
+        dtwm = DTWMetrics()
+        dtwb = DTWBarycenter()
+
+        x = np.linspace(0, 2 * pi, 40)
+        sequences = [np.sin(x + shift) for shift in (-0.2, 0.0, 0.2)]
+
+        average = dtwb.dba(
+            sequences,
+            init=sequences[0],
+            n_iterations=5,
+            distance_metric="sqeuclidean",
+        )
+        assert average.shape == (40, 1)
+
+        # averaging reduces the summed cost w.r.t. the initial template
+        cost = [dtwm.acm(average, y, "sqeuclidean")[-1, -1] for y in sequences]
+        cost_init = [
+            dtwm.acm(sequences[0], y, "sqeuclidean")[-1, -1] for y in sequences
+        ]
+        assert sum(cost) < sum(cost_init)
+
+        # parallel alignment gives same template
+        average_parallel = dtwb.dba(
+            sequences,
+            init=sequences[0],
+            n_iterations=5,
+            distance_metric="sqeuclidean",
+            n_jobs=2,
+        )
+        assert np.allclose(average, average_parallel)
+
+        # identical members are a fixed point, end samples included
+        x = np.sin(np.linspace(0, 6, 50))
+        average = dtwb.dba([x, x, x], init=x + 0.01, n_iterations=5)
+        assert np.allclose(average[:, 0], x)
@@ -0,0 +1,83 @@
+"""Provide unit test cases for the subsequence search index."""
+import logging
+import unittest
+
+import numpy as np
+import pytest
+from scipy.signal import argrelextrema
+
+from dtwmetrics.dtwindex import DTWIndex
+from dtwmetrics.dtwmetrics import DTWMetrics
+
+logging.basicConfig(encoding="utf-8", level=logging.INFO)
+
+
+class TestDTWIndex(unittest.TestCase):
+    """Test subsequence search index."""
+
+    def test_search_matches_full(self):
+        """Pruned search finds the matches of the full computation."""
+        dtwm = DTWMetrics()
+        rng = np.random.default_rng(0)
+
+        pattern = np.sin(np.linspace(0, 2 * np.pi, 30))
+        haystack = 0.1 * rng.standard_normal(1500)
+        for start, length in ((200, 30), (700, 40), (1200, 25)):
+            haystack[start : start + length] += np.sin(
+                np.linspace(0, 2 * np.pi, length)
+            )
+
+        index = DTWIndex(haystack)
+        for max_cost in (2.5, 4.0):
+            b, delta_b = index.search(pattern, max_cost=max_cost)
+
+            acm = dtwm.acm(pattern, haystack, sequence="sub")
+            delta_full = acm[-1, :]
+            b_full = argrelextrema(delta_full, np.less)[0]
+            b_full = b_full[delta_full[b_full] <= max_cost]
+
+            assert len(b) > 0
+            assert np.array_equal(b, b_full)
+            assert np.allclose(delta_b[b], delta_full[b])
+            assert index.pruning_stats["pruned_ratio"] > 0.5
+
+    def test_index_cache(self):
+        """Envelope cache is bounded, statistics match the haystack."""
+        haystack = np.cos(np.linspace(0, 60, 2000))
+
+        index = DTWIndex(haystack, max_envelopes=2)
+        for window in (10, 20, 30, 20):
+            index.envelope(window)
+        assert list(index.envelopes) == [30, 20]
+
+        mean, std = index.window_stats(50)
+        assert mean.shape == (2000, 1)
+        assert mean[500, 0] == pytest.approx(np.mean(haystack[451:501]))
+        assert std[500, 0] == pytest.approx(np.std(haystack[451:501]))
+        assert mean[10, 0] == pytest.approx(mean[49, 0])
+
+    def test_search_znorm(self):
+        """Per-window z-normalization finds scaled and offset matches."""
+        dtwm = DTWMetrics()
+        rng = np.random.default_rng(1)
+
+        pattern = np.sin(np.linspace(0, 2 * np.pi, 30))
+        haystack = 0.02 * rng.standard_normal(1000)
+        haystack[300:330] += 3.0 * pattern + 5.0
+        haystack[700:730] += 0.5 * pattern - 2.0
+
+        index = DTWIndex(haystack)
+        b, delta_b = index.search(
+            pattern, max_cost=3.0, max_length=30, znorm=True
+        )
+
+        assert np.any(np.abs(b - 329) <= 2)
+        assert np.any(np.abs(b - 729) <= 2)
+
+        # Δ(b) of the window normalized by its own statistics
+        z_pattern = dtwm.preprocess(pattern, "znorm")
+        for end in b:
+            y = haystack[end - 29 : end + 1]
+            y = (y - y.mean()) / y.std()
+            acm = dtwm.acm(z_pattern, y, sequence="sub")
+            assert delta_b[end] == pytest.approx(acm[-1, -1])
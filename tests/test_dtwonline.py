@@ -0,0 +1,87 @@
+"""Provide unit test cases for online alignment."""
+import logging
+import unittest
+
+import numpy as np
+import pytest
+
+from dtwmetrics.dtwmetrics import DTWMetrics
+from dtwmetrics.dtwonline import DTWOnline
+
+logging.basicConfig(encoding="utf-8", level=logging.INFO)
+
+
+class TestDTWOnline(unittest.TestCase):
+    """Test online alignment."""
+
+    def test_online_matches_batch(self):
+        """Incremental updates match batch acm."""
+        dtwm = DTWMetrics()
+
+        reference = np.cos(np.linspace(0, 6, 60))
+        query = np.cos(np.linspace(0.3, 6.3, 70))
+
+        for step_pattern in ("symmetric_p0", "symmetric_p1"):
+            online = DTWOnline(reference, step_pattern=step_pattern)
+            for start in range(0, 70, 7):
+                distance = online.update(query[start : start + 7])
+
+            acm = dtwm.acm(reference, query, step_pattern=step_pattern)
+            assert distance == pytest.approx(acm[-1, -1])
+            assert np.allclose(online.acm, acm)
+            assert np.array_equal(
+                online.optimal_warping_path(),
+                dtwm.optimal_warping_path(acm),
+            )
+
+    def test_online_without_path(self):
+        """Distance only mode keeps two columns."""
+        dtwm = DTWMetrics()
+
+        reference = np.cos(np.linspace(0, 6, 40))
+        query = np.cos(np.linspace(0.3, 6.3, 45))
+
+        online = DTWOnline(reference, sequence="sub", keep_path=False)
+        for sample in query:
+            online.update(sample)
+
+        acm = dtwm.acm(reference, query, sequence="sub")
+        assert online.distance == pytest.approx(acm[-1, -1])
+        assert online.columns.shape == (40, 2)
+
+        with pytest.raises(ValueError):
+            online.optimal_warping_path()
+
+    def test_online_max_cost(self):
+        """Online alignment is abandoned above the cutoff."""
+        dtwm = DTWMetrics()
+
+        reference = np.cos(np.linspace(0, 6, 40))
+        query = np.cos(np.linspace(0.3, 6.3, 45))
+        distance = dtwm.acm(reference, query)[-1, -1]
+
+        online = DTWOnline(reference, max_cost=distance + 1)
+        assert online.update(query) == pytest.approx(distance)
+
+        online = DTWOnline(reference, max_cost=1.0)
+        online.update(query[:20])
+        online.update(query[:20] + 5.0)
+        assert online.abandoned
+        assert online.update(query[20:]) == np.inf
+        assert online.acm.shape == (40, 65)
+
+    def test_online_multi_feature(self):
+        """Single samples of multi-feature queries."""
+        dtwm = DTWMetrics()
+
+        t = np.linspace(0, 6, 30)
+        reference = np.stack([np.cos(t), np.sin(t), t], axis=1)
+        query = np.stack([np.cos(t + 0.3), np.sin(t + 0.3), t], axis=1)
+
+        online = DTWOnline(reference)
+        for sample in query:
+            online.update(sample)
+
+        acm = dtwm.acm(reference, query)
+        assert online.distance == pytest.approx(acm[-1, -1])
+        assert np.allclose(online.acm, acm)
@@ -0,0 +1,53 @@
+"""Provide unit test cases for the shared memory worker pool."""
+import logging
+import unittest
+
+import numpy as np
+import pytest
+
+from dtwmetrics.dtwmetrics import DTWMetrics
+from dtwmetrics.dtwpool import DTWPool
+
+logging.basicConfig(encoding="utf-8", level=logging.INFO)
+
+
+class TestDTWPool(unittest.TestCase):
+    """Test shared memory worker pool."""
+
+    def test_pool_distances(self):
+        """Pool results match DTWMetrics."""
+        dtwm = DTWMetrics()
+
+        sequences = [
+            np.cos(np.linspace(s, 6 + s, n))
+            for s, n in ((0.0, 40), (0.2, 35), (0.4, 50), (0.6, 45))
+        ]
+        pairs = [(0, 1), (0, 2), (1, 3), (2, 3), (3, 0)]
+
+        with DTWPool(sequences, n_workers=2, chunk_size=2) as pool:
+            distances = pool.distances(pairs)
+            distances_paths, owps = pool.distances(pairs, paths=True)
+
+        for k, (i, j) in enumerate(pairs):
+            acm = dtwm.acm(sequences[i], sequences[j])
+            assert distances[k] == pytest.approx(acm[-1, -1])
+            assert distances_paths[k] == pytest.approx(acm[-1, -1])
+            assert np.array_equal(owps[k], dtwm.optimal_warping_path(acm))
+
+    def test_pool_max_cost(self):
+        """Abandoned pairs have infinite distance and no path."""
+        dtwm = DTWMetrics()
+
+        sequences = [np.zeros(20), np.zeros(25), np.full(30, 3.0)]
+        pairs = [(0, 1), (0, 2)]
+
+        with DTWPool(sequences, n_workers=1, max_cost=1.0) as pool:
+            distances, owps = pool.distances(pairs, paths=True)
+
+        assert distances[0] == 0.0
+        assert np.array_equal(
+            owps[0],
+            dtwm.optimal_warping_path(dtwm.acm(sequences[0], sequences[1])),
+        )
+        assert distances[1] == np.inf
+        assert len(owps[1]) == 0
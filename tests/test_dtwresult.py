@@ -0,0 +1,87 @@
+"""Provide unit test cases for alignment results."""
+import logging
+import os
+import tempfile
+import unittest
+
+import numpy as np
+import pytest
+
+from dtwmetrics.dtwmetrics import DTWMetrics
+from dtwmetrics.dtwresult import DTWResult
+
+logging.basicConfig(encoding="utf-8", level=logging.INFO)
+
+
+class TestDTWResult(unittest.TestCase):
+    """Test alignment results."""
+
+    def test_lazy_result(self):
+        """Only requested attributes are kept."""
+        dtwm = DTWMetrics()
+
+        y_1 = np.cos(np.linspace(0, 6, 50))
+        y_2 = np.cos(np.linspace(0.3, 6.3, 60))
+        cm, acm, owp, _ = dtwm.dtwm(y_1, y_2)
+
+        result = DTWResult(y_1, y_2)
+        assert result.distance == pytest.approx(acm[-1, -1])
+        assert set(result.cache) == {"distance"}
+        assert np.array_equal(result.owp, owp)
+        assert set(result.cache) == {"distance", "owp"}
+
+        assert np.allclose(result.cm, cm)
+        assert "acm" not in result.cache
+
+    def test_save_load(self):
+        """Compact encoding round trip."""
+        dtwm = DTWMetrics()
+
+        y_1 = np.cos(np.linspace(0, 12, 400))
+        y_2 = np.cos(np.linspace(0.3, 12.3, 500))
+        owp = dtwm.optimal_warping_path(dtwm.acm(y_1, y_2))
+
+        start, moves, runs = DTWResult.encode_path(owp)
+        assert moves.nbytes + runs.nbytes < owp.nbytes / 10
+        assert np.array_equal(DTWResult.decode_path(start, moves, runs), owp)
+
+        result = DTWResult(y_1, y_2, keep=("distance", "owp", "acm"))
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "result.npz")
+            result.save(path, matrices=("acm",), dtype="float16")
+            loaded = DTWResult.load(path)
+
+        assert loaded.distance == result.distance
+        assert np.array_equal(loaded.owp, owp)
+        assert loaded.acm.dtype == np.float16
+        assert loaded.options["step_pattern"] == "symmetric_p0"
+
+        with pytest.raises(ValueError):
+            _ = loaded.cm
+
+        # abandoned alignment has no path
+        result = DTWResult(y_1, y_2 + 1.0, max_cost=1.0)
+        assert result.distance == np.inf
+        assert result.owp is None and result.warped_query is None
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "result.npz")
+            result.save(path)
+            loaded = DTWResult.load(path)
+
+        assert loaded.distance == np.inf
+        assert loaded.owp is None
+        assert loaded.options["max_cost"] == 1.0
+
+    def test_single_sample(self):
+        """Paths of single sample sequences are encoded."""
+        rng = np.random.default_rng(0)
+
+        for n, m in ((1, 10), (10, 1), (1, 1)):
+            result = DTWResult(rng.random(n), rng.random(m))
+            with tempfile.TemporaryDirectory() as tmp:
+                path = os.path.join(tmp, "result.npz")
+                result.save(path)
+                loaded = DTWResult.load(path)
+
+            assert loaded.distance == result.distance
+            assert np.array_equal(loaded.owp, result.owp)
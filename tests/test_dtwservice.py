@@ -0,0 +1,87 @@
+"""Provide unit test cases for the asyncio alignment service."""
+import asyncio
+import logging
+import unittest
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import pytest
+
+from dtwmetrics.dtwmetrics import DTWMetrics
+from dtwmetrics.dtwservice import DTWService
+
+logging.basicConfig(encoding="utf-8", level=logging.INFO)
+
+
+class TestDTWService(unittest.TestCase):
+    """Test asyncio alignment service."""
+
+    def test_coalescing(self):
+        """Concurrent requests of one reference share a batch."""
+        dtwm = DTWMetrics()
+
+        reference = np.cos(np.linspace(0, 6, 40))
+        queries = [np.cos(np.linspace(s, 6 + s, 35)) for s in (0.1, 0.2, 0.3)]
+
+        async def run():
+            async with DTWService(
+                max_pending=2, executor=ThreadPoolExecutor(2)
+            ) as aligner:
+                distances = await asyncio.gather(
+                    *(aligner.distance(reference, q) for q in queries)
+                )
+                return distances, aligner.metrics()
+
+        distances, metrics = asyncio.run(run())
+
+        for query, distance in zip(queries, distances):
+            assert distance == pytest.approx(
+                dtwm.acm(reference, query)[-1, -1]
+            )
+        # backpressure admits two requests at once
+        assert metrics["batches"] == 2
+        assert metrics["requests"] == 3
+        assert metrics["queue_depth"] == 0
+
+    def test_queue_depth(self):
+        """Requests waiting for admission count towards queue depth."""
+        reference = np.cos(np.linspace(0, 6, 40))
+
+        async def run():
+            async with DTWService(
+                max_pending=1,
+                coalesce_delay=0.05,
+                executor=ThreadPoolExecutor(1),
+            ) as aligner:
+                requests = [
+                    asyncio.create_task(aligner.distance(reference, reference))
+                    for _ in range(3)
+                ]
+                await asyncio.sleep(0.01)
+                metrics = aligner.metrics()
+                await asyncio.gather(*requests)
+                return metrics, aligner.metrics()
+
+        during, after = asyncio.run(run())
+        assert during["queue_depth"] == 3
+        assert during["waiting"] == 2 and during["admitted"] == 1
+        assert after["queue_depth"] == 0
+        assert after["requests"] == 3
+
+    def test_failing_query(self):
+        """A failing query does not fail its batch."""
+        reference = np.cos(np.linspace(0, 6, 40))
+
+        async def run():
+            async with DTWService(
+                step_pattern="symmetric_p1", executor=ThreadPoolExecutor(1)
+            ) as aligner:
+                return await asyncio.gather(
+                    aligner.distance(reference, reference),
+                    aligner.distance(reference, reference[:10]),
+                    return_exceptions=True,
+                )
+
+        distance, error = asyncio.run(run())
+        assert distance == pytest.approx(0.0)
+        assert isinstance(error, ValueError)
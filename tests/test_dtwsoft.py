@@ -0,0 +1,45 @@
+"""Provide unit test cases for Soft-DTW."""
+import logging
+import unittest
+
+import numpy as np
+import pytest
+
+from dtwmetrics.dtwmetrics import DTWMetrics
+from dtwmetrics.dtwsoft import DTWSoft
+
+logging.basicConfig(encoding="utf-8", level=logging.INFO)
+
+
+class TestDTWSoft(unittest.TestCase):
+    """Test Soft-DTW."""
+
+    def test_soft_dtw_function(self):
+        """Soft-DTW value and gradient test."""
+        dtwm = DTWMetrics()
+        soft = DTWSoft()
+
+        y_1 = np.cos(np.linspace(0, 6, 30))
+        y_2 = np.cos(np.linspace(0.5, 6.5, 25))
+
+        # small gamma recovers the hard minimum
+        cm = dtwm.cm(y_1, y_2, "sqeuclidean")
+        hard = dtwm.step_symmetric_p0(cm)[-1, -1]
+        value = soft.soft_dtw(y_1, y_2, gamma=1e-4)
+        assert value == pytest.approx(hard, abs=1e-2)
+
+        # gradient matches finite differences
+        value, E = soft.soft_dtw_grad(cm, gamma=0.1)
+        eps = 1e-6
+        cm_eps = cm.copy()
+        cm_eps[10, 8] += eps
+        value_eps = soft.soft_acm(cm_eps, gamma=0.1)[-1, -1]
+        assert E[10, 8] == pytest.approx((value_eps - value) / eps, 1e-4)
+
+        # batched evaluation matches single evaluation
+        values, grads = soft.soft_dtw_batch(
+            [y_1, y_1, y_2], [y_2, y_1, y_1], gamma=0.1, gradient=True
+        )
+        assert values[0] == pytest.approx(value)
+        assert np.allclose(grads[0], E)
+        assert values[2] == pytest.approx(soft.soft_dtw(y_2, y_1, 0.1))
@@ -0,0 +1,57 @@
+"""Provide unit test cases for plotting utilities."""
+import logging
+import unittest
+
+import matplotlib
+import numpy as np
+
+from dtwmetrics.dtwmetrics import DTWMetrics
+from dtwmetrics.dtwutils import DTWUtils
+
+matplotlib.use("Agg")
+
+logging.basicConfig(encoding="utf-8", level=logging.INFO)
+
+
+class TestDTWUtils(unittest.TestCase):
+    """Test plotting utilities."""
+
+    def test_pool_matrix(self):
+        """Pooling reduces matrix size."""
+        dtwu = DTWUtils()
+
+        matrix = np.arange(35.0).reshape(5, 7)
+        reduced, rows, cols = dtwu.pool_matrix(matrix, max_size=3)
+        assert reduced.shape == (3, 3)
+        assert np.array_equal(rows, [0, 2, 4, 5])
+        assert np.array_equal(cols, [0, 3, 6, 7])
+        assert reduced[1, 1] == matrix[2, 3]
+
+        reduced, _, _ = dtwu.pool_matrix(matrix, max_size=3, pooling="mean")
+        assert reduced[2, 2] == matrix[4, 6]
+        assert reduced[0, 0] == np.mean(matrix[:2, :3])
+
+        reduced, rows, cols = dtwu.pool_matrix(matrix, window=(1, 3, 2, 5))
+        assert np.array_equal(reduced, matrix[1:3, 2:5])
+        assert np.array_equal(rows, [1, 2, 3])
+
+    def test_plot_large_input(self):
+        """Plotting of large inputs is decimated."""
+        dtwm = DTWMetrics()
+        dtwu = DTWUtils()
+
+        y_1 = np.cos(np.linspace(0, 24, 600))
+        y_2 = np.cos(np.linspace(0.2, 24.2, 700))
+        cm, acm, owp, _ = dtwm.dtwm(y_1, y_2)
+
+        decimated = dtwu.decimate_path(owp, max_points=100)
+        assert len(decimated) <= 101
+        assert np.array_equal(decimated[[0, -1]], owp[[0, -1]])
+
+        dtwu.plot_matrix(y_1, y_2, acm, owp=owp, plot_dim=0, max_size=100)
+        dtwu.plot_matrix(
+            y_1, y_2, cm, owp=owp, plot_dim=0, window=(100, 300, 100, 300)
+        )
+        dtwu.plot_warped_sequences(y_1, y_2, owp, max_points=200)
+        dtwu.plot_delta_b(acm, max_points=100)
+        matplotlib.pyplot.close("all")